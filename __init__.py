@@ -1,23 +1,86 @@
 """
 Support for LG Smartthinq devices.
 """
-import wideq
+import asyncio
 import logging
+import time
+from types import MappingProxyType
+import aiohttp
+from aiohttp import hdrs
+import async_timeout
 import voluptuous as vol
+import wideq
 import homeassistant.helpers.config_validation as cv
 
-from homeassistant.const import CONF_REGION, CONF_TOKEN
+from homeassistant.const import (
+    CONF_REGION, CONF_TOKEN, EVENT_HOMEASSISTANT_CLOSE,
+    EVENT_HOMEASSISTANT_STOP)
 from homeassistant.helpers import discovery
+from homeassistant.core import callback
 from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+
+from custom_components.smartthinq.coordinator import (
+    ACTIVE, DISCONNECTED, IDLE, SmartThinQCoordinator)
+from custom_components.smartthinq.model_cache import ModelInfoCache
+from custom_components.smartthinq.throttle import (
+    CONF_EXCLUDE, CONF_MIN_CHANGE, CONF_MIN_INTERVAL, AttributeThrottle)
+from custom_components.smartthinq.transport import LGTransport
 
 DOMAIN = 'smartthinq'
 
 CONF_LANGUAGE = 'language'
+CONF_POLL_INTERVALS = 'poll_intervals'
+CONF_ATTRIBUTE_UPDATES = 'attribute_updates'
+CONF_CONNECTION = 'connection'
+CONF_POOL_SIZE = 'pool_size'
+CONF_PER_HOST = 'per_host'
+CONF_KEEPALIVE = 'keepalive'
+CONF_COMPRESS = 'compress'
+
+# Seconds between polls per device type while active, idle or
+# disconnected. An interval of 0 would poll the cloud in a tight loop.
+POLL_DEVICE_TYPES = ('dryer', 'washer', 'dishwasher', 'dehumidifier')
+POLL_INTERVAL = vol.All(vol.Coerce(int), vol.Range(min=1))
+POLL_INTERVALS_SCHEMA = vol.Schema({
+    vol.In(POLL_DEVICE_TYPES): vol.Schema({
+        vol.Optional(ACTIVE): POLL_INTERVAL,
+        vol.Optional(IDLE): POLL_INTERVAL,
+        vol.Optional(DISCONNECTED): POLL_INTERVAL,
+    })
+})
+
+# How often each state attribute ('remaining_time_in_minutes', 'humidity',
+# ...) is published, and whether it is left off the main entity.
+ATTRIBUTE_UPDATES_SCHEMA = vol.Schema({
+    cv.string: vol.Schema({
+        vol.Optional(CONF_MIN_CHANGE): vol.All(
+            vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_MIN_INTERVAL): cv.positive_int,
+        vol.Optional(CONF_EXCLUDE, default=False): cv.boolean,
+    })
+})
+
+# The connections to the LG cloud: how many are kept open, in total and
+# per host, how many seconds an idle one is kept for reuse, and whether
+# responses are compressed.
+CONNECTION_SCHEMA = vol.Schema({
+    vol.Optional(CONF_POOL_SIZE, default=10): cv.positive_int,
+    vol.Optional(CONF_PER_HOST, default=4): cv.positive_int,
+    vol.Optional(CONF_KEEPALIVE, default=75): cv.positive_int,
+    vol.Optional(CONF_COMPRESS, default=True): cv.boolean,
+})
+
 CONFIG_SCHEMA = vol.Schema({
     DOMAIN: vol.Schema({
         vol.Required(CONF_TOKEN): cv.string,
         CONF_REGION: cv.string,
         CONF_LANGUAGE: cv.string,
+        vol.Optional(CONF_POLL_INTERVALS, default={}): POLL_INTERVALS_SCHEMA,
+        vol.Optional(CONF_ATTRIBUTE_UPDATES, default={}):
+            ATTRIBUTE_UPDATES_SCHEMA,
+        vol.Optional(CONF_CONNECTION, default={}): CONNECTION_SCHEMA,
         })
 }, extra=vol.ALLOW_EXTRA)
 
@@ -29,6 +92,17 @@ SMARTTHINQ_COMPONENTS = [
     'climate',
 ]
 KEY_SMARTTHINQ_DEVICES = 'smartthinq_devices'
+KEY_SMARTTHINQ_TRANSPORT = 'smartthinq_transport'
+KEY_SMARTTHINQ_COORDINATOR = 'smartthinq_coordinator'
+KEY_SMARTTHINQ_MODEL_CACHE = 'smartthinq_model_cache'
+KEY_SMARTTHINQ_ATTRIBUTE_UPDATES = 'smartthinq_attribute_updates'
+DISCOVERY_PARALLELISM = 4  # Devices whose model info loads at once.
+BOOTSTRAP_TIMEOUT = 60  # Seconds the background login may take.
+BOOTSTRAP_RETRY = 300  # Seconds before a failed login is retried.
+DNS_CACHE_TTL = 300  # Seconds the LG hosts' addresses are cached.
+STORAGE_KEY = DOMAIN
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 10
 README_URL = 'https://github.com/GuGu927/hass-smartthinq/blob/master/README.md'
 
 KEY_DEPRECATED_REFRESH_TOKEN = 'refresh_token'
@@ -52,7 +126,7 @@ DEPRECATION_WARNING = (
         key_language=CONF_LANGUAGE,
         domain=DOMAIN)
 
-def setup(hass, config):
+async def async_setup(hass, config):
     if DOMAIN not in config:
         LOGGER.warning(DEPRECATION_WARNING)
         return True
@@ -64,25 +138,307 @@ def setup(hass, config):
     region = config[DOMAIN].get(CONF_REGION)
     language = config[DOMAIN].get(CONF_LANGUAGE)
 
-    client = wideq.Client.from_token(refresh_token, region, language)
+    # Log in once for the whole integration. The platforms and every
+    # LGDevice share this client, so the session, its refresh and the
+    # device list it returned are reused instead of repeated per platform.
+    # All cloud calls go through the transport's own pooled aiohttp
+    # session, which keeps connections warm between polls.
+    # The gateway, access token and device list are kept in HA's storage,
+    # so a restart can set up the entities before logging in, and skip
+    # gateway discovery and the token exchange while the token is valid.
+    # The monitors' work IDs are stored too, and stopped on shutdown.
+    store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+    state = await store.async_load()
+    transport = LGTransport.from_state(
+        _async_create_websession(hass, config[DOMAIN][CONF_CONNECTION]),
+        refresh_token, region, language, state)
+    coordinator = SmartThinQCoordinator(
+        hass, transport, config[DOMAIN][CONF_POLL_INTERVALS])
+    monitors = coordinator.monitors
+    if state:
+        monitors.restore(state.get('monitors'))
 
-    hass.data[CONF_TOKEN] = refresh_token
-    hass.data[CONF_REGION] = region
-    hass.data[CONF_LANGUAGE] = language
+    def _dump_state():
+        state = transport.dump_state()
+        state['monitors'] = monitors.dump()
+        return state
 
-    for device in client.devices:
-        LOGGER.debug("Device: %s" % device.type)
-        hass.data[KEY_SMARTTHINQ_DEVICES].append(device.id)
+    @callback
+    def _async_save_state():
+        store.async_delay_save(_dump_state, STORAGE_SAVE_DELAY)
+
+    transport.add_refresh_listener(_async_save_state)
+    monitors.add_listener(_async_save_state)
+    hass.bus.async_listen_once(
+        EVENT_HOMEASSISTANT_STOP, monitors.async_stop_all)
+    hass.data[KEY_SMARTTHINQ_TRANSPORT] = transport
+    hass.data[KEY_SMARTTHINQ_COORDINATOR] = coordinator
+    hass.data[KEY_SMARTTHINQ_MODEL_CACHE] = ModelInfoCache(hass, transport)
+    hass.data[KEY_SMARTTHINQ_ATTRIBUTE_UPDATES] = (
+        config[DOMAIN][CONF_ATTRIBUTE_UPDATES])
+
+    @callback
+    def _async_load_platforms():
+        for device in transport.known_devices:
+            LOGGER.debug("Device: %s" % device.type)
+            hass.data[KEY_SMARTTHINQ_DEVICES].append(device.id)
+
+        for component in SMARTTHINQ_COMPONENTS:
+            hass.async_create_task(discovery.async_load_platform(
+                hass, component, DOMAIN, {}, config))
+
+    async def _async_bootstrap(now=None):
+        try:
+            async with async_timeout.timeout(BOOTSTRAP_TIMEOUT):
+                await transport.async_login()
+        except (aiohttp.ClientError, asyncio.TimeoutError, wideq.APIError,
+                ValueError, KeyError) as ex:
+            # Malformed gateway or login responses are retried too, or the
+            # integration would stay unconfigured until a restart.
+            LOGGER.warning('Logging in to SmartThinQ failed: %r. Retrying '
+                           'in %d seconds.', ex, BOOTSTRAP_RETRY)
+            async_call_later(hass, BOOTSTRAP_RETRY, _async_bootstrap)
+            return
+        _async_save_state()
+        hass.async_create_task(monitors.async_stop_orphans())
 
-    for component in SMARTTHINQ_COMPONENTS:
-        discovery.load_platform(hass, component, DOMAIN, {}, config)
+        if not platforms_loaded:
+            _async_load_platforms()
+        else:
+            new_ids = ({device.id for device in transport.known_devices} -
+                       set(hass.data[KEY_SMARTTHINQ_DEVICES]))
+            if new_ids:
+                LOGGER.info('New SmartThinQ devices %s will be added after '
+                            'a restart.', ', '.join(sorted(new_ids)))
+        coordinator.async_start()
+
+    # Don't hold up Home Assistant's startup on the LG cloud. With a known
+    # device list the entities are set up right away and show no status
+    # until their first poll; the login and the first polls follow in the
+    # background.
+    platforms_loaded = bool(transport.known_devices)
+    if platforms_loaded:
+        _async_load_platforms()
+    hass.async_create_task(_async_bootstrap())
     return True
 
 
+@callback
+def _async_create_websession(hass, options):
+    """Create the aiohttp session for the LG cloud.
+
+    Unlike Home Assistant's shared session, its connection pool is tuned
+    for polling: idle connections are kept longer than the active poll
+    interval, so steady polling reuses them instead of opening new ones
+    and repeating the TLS handshake. It is closed after the monitors were
+    stopped on shutdown.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=options[CONF_POOL_SIZE],
+        limit_per_host=options[CONF_PER_HOST],
+        keepalive_timeout=options[CONF_KEEPALIVE],
+        ttl_dns_cache=DNS_CACHE_TTL,
+        enable_cleanup_closed=True)
+    websession = aiohttp.ClientSession(
+        connector=connector,
+        headers={hdrs.ACCEPT_ENCODING: (
+            'gzip, deflate' if options[CONF_COMPRESS] else 'identity')})
+
+    async def _async_close(event):
+        await websession.close()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close)
+    return websession
+
+
+async def async_load_devices(hass, device_types):
+    """Look up the account's devices of the given types and load their
+    model info, DISCOVERY_PARALLELISM devices at a time.
+
+    Yields each DeviceInfo as soon as it is ready, in no particular order.
+    A device whose model info cannot be loaded is logged and skipped.
+    """
+    transport = hass.data[KEY_SMARTTHINQ_TRANSPORT]
+    model_cache = hass.data[KEY_SMARTTHINQ_MODEL_CACHE]
+    semaphore = asyncio.Semaphore(DISCOVERY_PARALLELISM)
+
+    async def _async_load(device_id):
+        device = await transport.async_get_device(device_id)
+        if device is None or device.type not in device_types:
+            return None
+        LOGGER.debug("Device: %s" % device.type)
+        async with semaphore:
+            try:
+                # The wideq wrappers read the model info in their
+                # constructor, so load it here without blocking the loop.
+                await model_cache.async_model_info(device)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError,
+                    KeyError) as ex:
+                # A broken model document must not drop the other devices.
+                LOGGER.warning('Loading the model info of %s failed: %r',
+                               device.name, ex)
+                return None
+        return device
+
+    for future in asyncio.as_completed(
+            [_async_load(device_id)
+             for device_id in hass.data[KEY_SMARTTHINQ_DEVICES]]):
+        device = await future
+        if device is not None:
+            yield device
+
+
 class LGDevice(Entity):
-    def __init__(self, client, device):
-        self._client = client
+    def __init__(self, coordinator, device, wrapper_type, status_type):
+        self._coordinator = coordinator
+        self._transport = coordinator.transport
+        self._client = coordinator.transport.client
         self._device = device
+        self._polled = coordinator.register(
+            device, wrapper_type, status_type, self.is_active)
+        self._status = None
+        self._fingerprint = None
+        self._attributes = MappingProxyType({})
+        self._attribute_listeners = []
+        self._unsub_status = None
+        # What the entity itself shows: the attributes less the excluded
+        # ones, and its state.
+        self._excluded = frozenset()
+        self._entity_attributes = self._attributes
+        self._entity_state = None
+        self._throttle = None
+        self._unsub_flush = None
+
+    @staticmethod
+    def is_active(status):
+        """Whether a status shows a running cycle, which the coordinator
+        polls at the fast interval.
+        """
+        return True
+
+    @property
+    def should_poll(self):
+        # The coordinator polls the device and pushes each new status.
+        return False
+
+    def status_fingerprint(self):
+        """A cheap value that changes whenever anything the entity shows
+        changes. Everything it shows is derived from the current status's
+        decoded monitor data.
+        """
+        return self._status.data if self._status else None
+
+    def _build_attributes(self, status):
+        """Return the state attributes for `status`, or for an unreachable
+        device if it is None.
+
+        This runs once per changed status. The entity's properties read
+        from the result instead of decoding the status on every access.
+        """
+        return {}
+
+    def _update_attributes(self):
+        """Rebuild the attribute snapshot from the current status.
+
+        Returns whether what the entity shows changed, i.e. whether its
+        state needs to be written.
+        """
+        self._fingerprint = self.status_fingerprint()
+        attributes = self._build_attributes(self._status)
+        if self._throttle is not None:
+            attributes = self._throttle.apply(attributes)
+            self._schedule_flush(self._throttle.next_flush)
+        if attributes == self._attributes:
+            return False
+
+        self._attributes = MappingProxyType(attributes)
+        for listener in list(self._attribute_listeners):
+            listener(self._attributes)
+        if not self._excluded:
+            self._entity_attributes = self._attributes
+            return True
+
+        entity_attributes = {
+            attribute: value for attribute, value in attributes.items()
+            if attribute not in self._excluded}
+        entity_state = self.state
+        changed = (entity_attributes != self._entity_attributes or
+                   entity_state != self._entity_state)
+        self._entity_attributes = MappingProxyType(entity_attributes)
+        self._entity_state = entity_state
+        return changed
+
+    def _schedule_flush(self, when):
+        if self._unsub_flush:
+            self._unsub_flush()
+            self._unsub_flush = None
+        if when is not None:
+            self._unsub_flush = async_call_later(
+                self.hass, max(when - time.monotonic(), 0),
+                self._async_flush_attributes)
+
+    @callback
+    def _async_flush_attributes(self, now):
+        # Publish the values the throttle held back until now.
+        self._unsub_flush = None
+        if self._update_attributes():
+            self.async_schedule_update_ha_state()
+
+    def subscribe_attributes(self, listener):
+        """Call `listener(attributes)` with every new attribute snapshot.
+
+        Returns a function that removes the listener again.
+        """
+        self._attribute_listeners.append(listener)
+        return lambda: self._attribute_listeners.remove(listener)
+
+    @property
+    def attributes(self):
+        """The current attribute snapshot, including the attributes left
+        off the entity itself, as `subscribe_attributes` passes it.
+        """
+        return self._attributes
+
+    @property
+    def state_attributes(self):
+        return self._entity_attributes
+
+    async def async_added_to_hass(self):
+        options = self.hass.data.get(KEY_SMARTTHINQ_ATTRIBUTE_UPDATES, {})
+        self._excluded = frozenset(
+            attribute for attribute, option in options.items()
+            if option.get(CONF_EXCLUDE))
+        if any(option.get(CONF_MIN_CHANGE) or option.get(CONF_MIN_INTERVAL)
+               for option in options.values()):
+            self._throttle = AttributeThrottle(
+                options, self._build_attributes(None))
+        self._status = self._polled.status
+        self._update_attributes()
+        self._unsub_status = self._polled.subscribe(self._status_updated)
+
+    async def async_will_remove_from_hass(self):
+        if self._unsub_status:
+            self._unsub_status()
+            self._unsub_status = None
+        self._schedule_flush(None)
+
+    @callback
+    def _status_updated(self, status):
+        # Most polls of an idle appliance return what the last one did,
+        # either as the same status (the transport's answer to a repeated
+        # payload) or as one with the same fingerprint; skip rebuilding
+        # the attributes for those. The state write is skipped too for
+        # statuses whose changes are all throttled or excluded.
+        if status is not self._status:
+            self._status = status
+            if self.status_fingerprint() != self._fingerprint:
+                if self._update_attributes():
+                    self.async_schedule_update_ha_state()
+                return
+        self._status_repeated()
+
+    def _status_repeated(self):
+        """Called for a poll that reported what the previous one did."""
 
     @property
     def name(self):
@@ -1,15 +1,20 @@
+import asyncio
 import logging
 import time
+import types
+import async_timeout
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
 
 from homeassistant import const
-from homeassistant.const import CONF_REGION, CONF_TOKEN
 from homeassistant.components import climate
 from homeassistant.components.climate import ClimateDevice
 from homeassistant.components.climate import const as c_const
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
 from custom_components.smartthinq import (
-    CONF_LANGUAGE, KEY_SMARTTHINQ_DEVICES, LGDevice)
+    KEY_SMARTTHINQ_COORDINATOR, LGDevice, async_load_devices)
+from custom_components.smartthinq.commands import CommandQueue
 
 KEY_DH_ON = 'on'
 KEY_DH_OFF = 'off'
@@ -49,57 +54,178 @@ ATTR_DH_TARGET_HUMIDITY = 'target_humidity'
 ATTR_DH_MIN_HUMIDITY = 'min_humidity'
 ATTR_DH_MAX_HUMIDITY = 'max_humidity'
 
-MAX_RETRIES = 5
-TRANSIENT_EXP = 5.0  # Report set temperature / humidity for 5 seconds.
+COMMAND_TIMEOUT = 10.0  # Give up on a control request after 10 seconds.
+LOOP_BUDGET = 0.005  # Warn when a command holds the event loop for longer.
 HUM_MIN = 30
 HUM_MAX = 70
 HUM_STEP = 5
 
+# Seconds a requested value is shown, unless a poll confirms it sooner,
+# before the device's own value is trusted again. Powering on takes the
+# dehumidifier longest to report.
+OPTIMISTIC_EXPIRY = {
+    ATTR_DH_STATE: 60.0,
+    ATTR_DH_HVAC_MODE: 60.0,
+    ATTR_DH_PRESET_MODE: 45.0,
+    ATTR_DH_FAN_MODE: 45.0,
+    ATTR_DH_AIRREMOVAL_MODE: 45.0,
+    ATTR_DH_TARGET_HUMIDITY: 45.0,
+}
+POWER_ON = {
+    ATTR_DH_STATE: KEY_DH_ON,
+    ATTR_DH_HVAC_MODE: c_const.HVAC_MODE_DRY,
+}
+POWER_OFF = {
+    ATTR_DH_STATE: KEY_DH_OFF,
+    ATTR_DH_HVAC_MODE: c_const.HVAC_MODE_OFF,
+    ATTR_DH_PRESET_MODE: c_const.HVAC_MODE_OFF,
+    ATTR_DH_FAN_MODE: c_const.HVAC_MODE_OFF,
+}
+
 async def async_setup_platform(hass, config, add_devices, discovery_info=None):
     """Set up the LG entities"""
 
-    refresh_token = hass.data[CONF_TOKEN]
-    region = hass.data[CONF_REGION]
-    language = hass.data[CONF_LANGUAGE]
-
-    client = wideq.Client.from_token(refresh_token, region, language)
-    dehumidifiers = []
-
-    for device_id in hass.data[KEY_SMARTTHINQ_DEVICES]:
-        device = client.get_device(device_id)
-        LOGGER.debug("Device: %s" % device.type)
+    coordinator = hass.data[KEY_SMARTTHINQ_COORDINATOR]
 
+    # Each device is added as soon as its model info is loaded.
+    async for device in async_load_devices(
+            hass, (wideq.DeviceType.DEHUMIDIFIER,)):
         if device.type == wideq.DeviceType.DEHUMIDIFIER:
             base_name = "lg_dehumidifier_" + device.name
             LOGGER.debug("Creating new LG Dehumidifier: %s" % base_name)
             try:
-                dehumidifiers.append(LGDehumDevice(client, device, base_name))
+                add_devices([LGDehumDevice(coordinator, device, base_name)])
             except wideq.NotConnectedError:
                 # Dehumidifier are only connected when in use. Ignore
                 # NotConnectedError on platform setup.
                 pass
 
-    if dehumidifiers:
-        add_devices(dehumidifiers, True)
+@types.coroutine
+def _timed_steps(coro, steps):
+    """Await `coro`, appending to `steps` how long each of its steps ran
+    on the event loop.
+    """
+    step, args = coro.send, (None,)
+    while True:
+        start = time.perf_counter()
+        try:
+            future = step(*args)
+        except StopIteration as exc:
+            return exc.value
+        finally:
+            steps.append(time.perf_counter() - start)
+        try:
+            step, args = coro.send, ((yield future),)
+        except BaseException as exc:
+            step, args = coro.throw, (exc,)
 
 class LGDehumDevice(LGDevice, ClimateDevice):
-    def __init__(self, client, device, name):
+    def __init__(self, coordinator, device, name):
         """Initialize an LG Dehumidifier Device."""
 
-        super().__init__(client, device)
+        super().__init__(
+            coordinator, device, dehum.DehumDevice, dehum.DehumStatus)
 
         # This constructor is called during platform creation. It must not
         # involve any API calls that actually need the dehumidifier to be
         # connected, otherwise the device construction will fail and the entity
         # will not get created. Specifically, calls that depend on dehumidifier
-        # interaction should only happen in update(...), including the start of
-        # the monitor task.
-        self._dehumidifier = dehum.DehumDevice(client, device)
+        # interaction are left to the coordinator's polling, including the
+        # start of the monitor task.
+        self._dehumidifier = self._polled.device
         self._name = name
-        self._status = None
-        self._transient_humi = None
-        self._transient_time = None
-        self._failed_request_count = 0
+        # Requested values by attribute, with when they expire.
+        self._optimistic = {}
+        self._unsub_expiry = None
+        self._commands = CommandQueue(
+            coordinator.hass, self._async_command)
+
+    @staticmethod
+    def is_active(status):
+        return status.is_on
+
+    def _set_optimistic(self, values):
+        """Show the requested `values` by attribute right away, until a
+        poll reports them or they expire.
+        """
+        now = time.monotonic()
+        for attribute, value in values.items():
+            self._optimistic[attribute] = (
+                value, now + OPTIMISTIC_EXPIRY[attribute])
+        if self._update_attributes():
+            self.async_schedule_update_ha_state()
+
+    def _clear_optimistic(self, values):
+        """Stop showing the requested `values` by attribute, unless another
+        value was requested since.
+        """
+        cleared = False
+        for attribute, value in values.items():
+            if self._optimistic.get(attribute, (None,))[0] == value:
+                del self._optimistic[attribute]
+                cleared = True
+        if cleared and self._update_attributes():
+            self.async_schedule_update_ha_state()
+
+    def _apply_optimistic(self, data):
+        # A value is dropped once the device reports it, or when it
+        # expires; until then it replaces what the device reports.
+        now = time.monotonic()
+        for attribute, (value, expires) in list(self._optimistic.items()):
+            if data[attribute] == value or now >= expires:
+                del self._optimistic[attribute]
+            else:
+                data[attribute] = value
+
+    def _update_attributes(self):
+        changed = super()._update_attributes()
+        if self._unsub_expiry:
+            self._unsub_expiry()
+            self._unsub_expiry = None
+        if self._optimistic and self.hass is not None:
+            expires = min(expires for _, expires in self._optimistic.values())
+            self._unsub_expiry = async_call_later(
+                self.hass, max(expires - time.monotonic(), 0),
+                self._async_expire)
+        return changed
+
+    @callback
+    def _async_expire(self, now):
+        self._unsub_expiry = None
+        if self._update_attributes():
+            self.async_schedule_update_ha_state()
+
+    async def async_will_remove_from_hass(self):
+        await super().async_will_remove_from_hass()
+        self._commands.cancel()
+        self._optimistic.clear()
+        if self._unsub_expiry:
+            self._unsub_expiry()
+            self._unsub_expiry = None
+
+    def _build_attributes(self, status):
+        """Return the optional state attributes."""
+        off = c_const.HVAC_MODE_OFF
+        is_on = bool(status) and status.is_on
+        data = {}
+        data[ATTR_DH_STATE] = (KEY_DH_ON if status and status.state == '켜짐'
+                               else KEY_DH_OFF)
+        data[ATTR_DH_AIRREMOVAL_MODE] = (status.airremoval_state if status
+                                         else off)
+        data[ATTR_DH_FAN_MODE] = status.windstrength_state if is_on else off
+        data[ATTR_DH_FAN_MODES] = self.fan_modes
+        data[ATTR_DH_PRESET_MODE] = status.mode if is_on else off
+        data[ATTR_DH_PRESET_MODES] = self.preset_modes
+        data[ATTR_DH_HVAC_MODE] = c_const.HVAC_MODE_DRY if is_on else off
+        data[ATTR_DH_HVAC_MODES] = self.hvac_modes
+        data[ATTR_DH_HUMIDITY] = status.current_humidity if status else 0
+        data[ATTR_DH_TARGET_HUMIDITY] = status.target_humidity if status else 0
+        data[ATTR_DH_MIN_HUMIDITY] = self.min_humidity
+        data[ATTR_DH_MAX_HUMIDITY] = self.max_humidity
+        if status:
+            self._apply_optimistic(data)
+
+        return data
 
     @property
     def name(self):
@@ -107,9 +233,7 @@ class LGDehumDevice(LGDevice, ClimateDevice):
 
     @property
     def is_on(self):
-        if self._status:
-            return self._status.is_on
-        return False
+        return self._attributes[ATTR_DH_HVAC_MODE] != c_const.HVAC_MODE_OFF
 
     @property
     def device_type(self):
@@ -119,19 +243,95 @@ class LGDehumDevice(LGDevice, ClimateDevice):
     def available(self):
         return True
 
+    async def _async_command(self, func, *args):
+        """Send a control command through the async transport.
+
+        The request never blocks the event loop and is abandoned after
+        COMMAND_TIMEOUT seconds. Every step the command runs on the loop is
+        timed, and a warning is logged if one took longer than LOOP_BUDGET.
+        An expired session is refreshed once and the command retried.
+        Returns whether the command was sent.
+        """
+        steps = []
+        session = self._client.session
+        sent = False
+        try:
+            async with async_timeout.timeout(COMMAND_TIMEOUT):
+                try:
+                    await _timed_steps(
+                        func(self._dehumidifier, *args), steps)
+                except wideq.NotLoggedInError:
+                    # Wait for the coordinator's shared refresh, then retry.
+                    await self._coordinator.async_refresh(session)
+                    await _timed_steps(
+                        func(self._dehumidifier, *args), steps)
+            sent = True
+        except asyncio.TimeoutError:
+            LOGGER.warning('%s did not answer within %s seconds.',
+                           self.name, COMMAND_TIMEOUT)
+        finally:
+            blocked = max(steps, default=0.0)
+            if blocked > LOOP_BUDGET:
+                LOGGER.warning('%s held the event loop for %.1f ms.',
+                               func.__name__, blocked * 1000)
+            else:
+                LOGGER.debug('%s held the event loop for %.1f ms.',
+                             func.__name__, blocked * 1000)
+        return sent
+
+    async def _async_submit(self, values, field, func, *args):
+        """Queue a command showing `values`, and stop showing them if it
+        fails.
+        """
+        sent = False
+        try:
+            sent = await self._commands.submit(field, func, *args)
+        finally:
+            if not sent:
+                self._clear_optimistic(values)
+
+    async def _async_control(self, values, field, func, *args,
+                             power_on=False):
+        """Show `values` right away and set the control `field` by sending
+        `func(*args)`, powering the device on first if `power_on` is set.
+
+        Nothing is sent if the device already shows `values`, as polled or
+        as requested before. Rapid requests for the same field are
+        coalesced and the device's commands are sent one at a time, see
+        CommandQueue; a power-on several requests imply is sent once.
+        """
+        if all(self._attributes.get(attribute) == value
+               for attribute, value in values.items()):
+            LOGGER.debug('%s already shows %s; not sending %s.',
+                         self.name, values, field)
+            return
+
+        # A failed command only drops the values it set, so a power-on
+        # sent along still shows.
+        commands = [self._async_submit(values, field, func, *args)]
+        if power_on and not self.is_on:
+            commands.insert(0, self._async_submit(
+                POWER_ON, 'Operation', self._transport.async_dehum_set_on,
+                True))
+            values = dict(POWER_ON, **values)
+        self._set_optimistic(values)
+        await asyncio.gather(*commands)
+
     async def async_turn_on(self):
         if self._status:
-            if not self._status.is_on:
-                self._dehumidifier.set_on(True)
+            if not self.is_on:
+                await self._async_control(
+                    POWER_ON, 'Operation',
+                    self._transport.async_dehum_set_on, True)
             LOGGER.info('Turn On %s', self.name)
-            await self.async_update_ha_state()
 
     async def async_turn_off(self) :
         if self._status:
-            if self._status.is_on:
-                self._dehumidifier.set_on(False)
+            if self.is_on:
+                await self._async_control(
+                    POWER_OFF, 'Operation',
+                    self._transport.async_dehum_set_on, False)
             LOGGER.info('Turn Off %s', self.name)
-            await self.async_update_ha_state()
 
         # Fake turn off
         if c_const.HVAC_MODE_OFF in self.hvac_modes:
@@ -145,25 +345,6 @@ class LGDehumDevice(LGDevice, ClimateDevice):
             c_const.SUPPORT_FAN_MODE
         )
 
-    @property
-    def state_attributes(self):
-        """Return the optional state attributes."""
-        data = {}
-        data[ATTR_DH_STATE] = self.state
-        data[ATTR_DH_AIRREMOVAL_MODE] = self.is_airremoval_mode
-        data[ATTR_DH_FAN_MODE] = self.fan_mode
-        data[ATTR_DH_FAN_MODES] = self.fan_modes
-        data[ATTR_DH_PRESET_MODE] = self.preset_mode
-        data[ATTR_DH_PRESET_MODES] = self.preset_modes
-        data[ATTR_DH_HVAC_MODE] = self.hvac_mode
-        data[ATTR_DH_HVAC_MODES] = self.hvac_modes
-        data[ATTR_DH_HUMIDITY] = self.current_humidity
-        data[ATTR_DH_TARGET_HUMIDITY] = self.target_humidity
-        data[ATTR_DH_MIN_HUMIDITY] = self.min_humidity
-        data[ATTR_DH_MAX_HUMIDITY] = self.max_humidity
-
-        return data
-
     @property
     def precision(self):
         return const.PRECISION_WHOLE
@@ -174,9 +355,7 @@ class LGDehumDevice(LGDevice, ClimateDevice):
 
     @property
     def state(self):
-        if self._status and self._status.state == '켜짐':
-            return KEY_DH_ON
-        return KEY_DH_OFF
+        return self._attributes[ATTR_DH_STATE]
 
     @property
     def min_temp(self):
@@ -196,39 +375,19 @@ class LGDehumDevice(LGDevice, ClimateDevice):
 
     @property
     def current_humidity(self):
-        return self._status.current_humidity if self._status else 0
+        return self._attributes[ATTR_DH_HUMIDITY]
 
     @property
     def target_humidity(self):
-        # Use the recently-set target temperature if it was set recently
-        # (within TRANSIENT_EXP seconds ago).
-        if self._transient_humi:
-            interval = time.time() - self._transient_time
-            if interval < TRANSIENT_EXP:
-                return self._transient_humi
-            else:
-                self._transient_humi = None
-
-        # Otherwise, actually use the device's state.
-        return self._status.target_humidity if self._status else 0
+        return self._attributes[ATTR_DH_TARGET_HUMIDITY]
 
     @property
     def current_temperature(self):
-        return self._status.current_humidity if self._status else 0
+        return self._attributes[ATTR_DH_HUMIDITY]
 
     @property
     def target_temperature(self):
-        # Use the recently-set target temperature if it was set recently
-        # (within TRANSIENT_EXP seconds ago).
-        if self._transient_humi:
-            interval = time.time() - self._transient_time
-            if interval < TRANSIENT_EXP:
-                return self._transient_humi
-            else:
-                self._transient_humi = None
-
-        # Otherwise, actually use the device's state.
-        return self._status.target_humidity if self._status else 0
+        return self._attributes[ATTR_DH_TARGET_HUMIDITY]
 
     @property
     def target_temperature_low(self):
@@ -245,11 +404,7 @@ class LGDehumDevice(LGDevice, ClimateDevice):
 
     @property
     def preset_mode(self):
-        if self._status:
-            if not self._status.is_on:
-                return c_const.HVAC_MODE_OFF
-            return self._status.mode
-        return c_const.HVAC_MODE_OFF
+        return self._attributes[ATTR_DH_PRESET_MODE]
 
     @property
     def preset_modes(self):
@@ -257,11 +412,7 @@ class LGDehumDevice(LGDevice, ClimateDevice):
 
     @property
     def hvac_mode(self):
-        if self._status:
-            if not self._status.is_on:
-                return c_const.HVAC_MODE_OFF
-            return c_const.HVAC_MODE_DRY
-        return c_const.HVAC_MODE_OFF
+        return self._attributes[ATTR_DH_HVAC_MODE]
 
     @property
     def hvac_modes(self):
@@ -269,11 +420,7 @@ class LGDehumDevice(LGDevice, ClimateDevice):
 
     @property
     def fan_mode(self):
-        if self._status:
-            if not self._status.is_on:
-                return c_const.HVAC_MODE_OFF
-            return self._status.windstrength_state
-        return c_const.HVAC_MODE_OFF
+        return self._attributes[ATTR_DH_FAN_MODE]
 
     @property
     def fan_modes(self):
@@ -281,124 +428,71 @@ class LGDehumDevice(LGDevice, ClimateDevice):
 
     async def async_set_preset_mode(self, preset_mode):
         if preset_mode == c_const.HVAC_MODE_OFF:
-            self._dehumidifier.set_on(False)
+            await self._async_control(
+                POWER_OFF, 'Operation',
+                self._transport.async_dehum_set_on, False)
             return
 
         if self._status:
-            if not self._status.is_on:
-                self._dehumidifier.set_on(True)
             LOGGER.info('Setting mode to %s...', preset_mode)
-            self._dehumidifier.set_mode(preset_mode)
+            await self._async_control(
+                {ATTR_DH_PRESET_MODE: preset_mode}, 'OpMode',
+                self._transport.async_dehum_set_mode, preset_mode,
+                power_on=True)
             LOGGER.info('Mode set.')
-            await self.async_update_ha_state()
 
     async def async_set_hvac_mode(self, hvac_mode):
         if hvac_mode == c_const.HVAC_MODE_OFF:
-            self._dehumidifier.set_on(False)
+            await self._async_control(
+                POWER_OFF, 'Operation',
+                self._transport.async_dehum_set_on, False)
             return
 
         if self._status:
-            if not self._status.is_on:
-                self._dehumidifier.set_on(True)
             if hvac_mode == 'dry':
                 value = '스마트제습'
             LOGGER.info('Setting mode to %s...', value)
-            self._dehumidifier.set_mode(value)
+            await self._async_control(
+                {ATTR_DH_PRESET_MODE: value}, 'OpMode',
+                self._transport.async_dehum_set_mode, value, power_on=True)
             LOGGER.info('Mode set.')
-            await self.async_update_ha_state()
 
     async def async_set_fan_mode(self, fan_mode):
         if self._status:
-            if not self._status.is_on:
-                self._dehumidifier.set_on(True)
             LOGGER.info('Setting fan mode to %s', fan_mode)
-            self._dehumidifier.set_windstrength(fan_mode)
+            await self._async_control(
+                {ATTR_DH_FAN_MODE: fan_mode}, 'WindStrength',
+                self._transport.async_dehum_set_windstrength, fan_mode,
+                power_on=True)
             LOGGER.info('Fan mode set.')
-            await self.async_update_ha_state()
 
     @property
     def is_airremoval_mode(self):
-        if self._status:
-            return self._status.airremoval_state
-        return c_const.HVAC_MODE_OFF
+        return self._attributes[ATTR_DH_AIRREMOVAL_MODE]
 
-    def airremoval_mode(self, airremoval_mode):
-        if airremoval_mode == '켜짐':
-            self._dehum.set_airremoval(True)
-        elif airremoval_mode == '꺼짐':
-            self._dehum.set_airremoval(False)
+    async def async_set_airremoval_mode(self, airremoval_mode):
+        if airremoval_mode in ('켜짐', '꺼짐'):
+            await self._async_control(
+                {ATTR_DH_AIRREMOVAL_MODE: airremoval_mode}, 'AirRemoval',
+                self._transport.async_dehum_set_airremoval,
+                airremoval_mode == '켜짐')
 
     async def async_set_temperature(self, **kwargs):
         temperature = kwargs['temperature']
-        self._transient_humi = temperature
-        self._transient_time = time.time()
-
         if self._status:
-            if not self._status.is_on:
-                self._dehumidifier.set_on(True)
             LOGGER.info('Setting temperature to %s...', temperature)
-            self._dehumidifier.set_humidity(temperature)
+            await self._async_control(
+                {ATTR_DH_TARGET_HUMIDITY: temperature}, 'HumidityCfg',
+                self._transport.async_dehum_set_humidity, temperature,
+                power_on=True)
             LOGGER.info('Temperature set.')
-            await self.async_update_ha_state()
 
     async def async_set_humidity(self, **kwargs):
         humidity = kwargs['humidity']
-        self._transient_humi = humidity
-        self._transient_time = time.time()
-
         if self._status:
-            if not self._status.is_on:
-                self._dehumidifier.set_on(True)
             LOGGER.info('Setting humidity to %s...', humidity)
-            self._dehumidifier.set_humidity(humidity)
+            await self._async_control(
+                {ATTR_DH_TARGET_HUMIDITY: humidity}, 'HumidityCfg',
+                self._transport.async_dehum_set_humidity, humidity,
+                power_on=True)
             LOGGER.info('Humidity set.')
-            await self.async_update_ha_state()
-
-    def _restart_monitor(self):
-        try:
-            self._dehumidifier.monitor_start()
-        except wideq.NotConnectedError:
-            self._status = None
-        except wideq.NotLoggedInError:
-            LOGGER.info('Session expired. Refreshing.')
-            self._client.refresh()
-
-    def update(self):
-        """Poll for dehumidifier state updates."""
-
-        # This method is polled, so try to avoid sleeping in here. If an error
-        # occurs, it will naturally be retried on the next poll.
-
-        LOGGER.debug('Updating %s.', self.name)
-
-        # On initial construction, the dehumidifier monitor task
-        # will not have been created. If so, start monitoring here.
-        if getattr(self._dehumidifier, 'mon', None) is None:
-            self._restart_monitor()
-
-        try:
-            status = self._dehumidifier.poll()
-        except wideq.NotConnectedError:
-            self._status = None
-            return
-        except wideq.NotLoggedInError:
-            LOGGER.info('Session expired. Refreshing.')
-            self._client.refresh()
-            self._restart_monitor()
-            return
-
-        if status:
-            LOGGER.debug('Status updated.')
-            self._status = status
-            self._failed_request_count = 0
-            return
-
-        LOGGER.debug('No status available yet.')
-        self._failed_request_count += 1
-
-        if self._failed_request_count >= MAX_RETRIES:
-            # We tried several times but got no result. This might happen
-            # when the monitoring request gets into a bad state, so we
-            # restart the task.
-            self._restart_monitor()
-            self._failed_request_count = 0
@@ -0,0 +1,84 @@
+"""
+Queueing of the control commands sent to LG appliances.
+"""
+import asyncio
+import logging
+import time
+
+from homeassistant.helpers.event import async_call_later
+
+LOGGER = logging.getLogger(__name__)
+
+DEBOUNCE = 1.0  # Seconds without a new command before they are sent.
+
+
+class CommandQueue:
+    """Sends the control commands of one device one at a time, keeping
+    only the last value of each field.
+
+    Commands wait until none was submitted for DEBOUNCE seconds, so
+    dragging a slider or clicking through presets sends the value they
+    settle on once, not every step in between. The remaining commands are
+    sent in the order of their last submission, so the last intent wins,
+    and never while an earlier batch is still being sent. How long each
+    took from its submission to its completion is logged.
+
+    `send(func, *args)` is awaited to send a command.
+    """
+
+    def __init__(self, hass, send):
+        self.hass = hass
+        self._send = send
+        self._pending = {}
+        self._unsub_flush = None
+        self._lock = asyncio.Lock()
+
+    def submit(self, field, func, *args):
+        """Set `field` by sending `func(*args)`.
+
+        Returns a future for what sending this or a later value of the
+        field returned, or raised.
+        """
+        waiters, queued = [], time.monotonic()
+        if field in self._pending:
+            # Superseded; wait for the new value instead.
+            _, _, waiters, queued = self._pending.pop(field)
+            LOGGER.debug('Coalescing %s.', field)
+        future = self.hass.loop.create_future()
+        waiters.append(future)
+        self._pending[field] = (func, args, waiters, queued)
+
+        if self._unsub_flush:
+            self._unsub_flush()
+        self._unsub_flush = async_call_later(
+            self.hass, DEBOUNCE, self._async_flush)
+        return future
+
+    async def _async_flush(self, now):
+        self._unsub_flush = None
+        pending, self._pending = self._pending, {}
+        async with self._lock:
+            for field, (func, args, waiters, queued) in pending.items():
+                try:
+                    result = await self._send(func, *args)
+                except Exception as ex:
+                    # Raise it in the callers waiting for this command.
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(ex)
+                else:
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_result(result)
+                LOGGER.debug('%s took %.1f s from queue to completion.',
+                             field, time.monotonic() - queued)
+
+    def cancel(self):
+        """Drop the commands not sent yet."""
+        if self._unsub_flush:
+            self._unsub_flush()
+            self._unsub_flush = None
+        pending, self._pending = self._pending, {}
+        for _, _, waiters, _ in pending.values():
+            for waiter in waiters:
+                waiter.cancel()
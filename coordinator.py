@@ -0,0 +1,230 @@
+"""
+Shared polling of LG SmartThinQ appliances.
+"""
+import asyncio
+import logging
+import random
+
+import aiohttp
+import wideq
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+
+from custom_components.smartthinq.monitor import MonitorManager
+
+LOGGER = logging.getLogger(__name__)
+
+STAGGER = 3  # Seconds between the first polls of consecutive devices.
+BACKOFF_JITTER = 0.25  # Shorten each backoff delay by up to 25%.
+
+ACTIVE = 'active'
+IDLE = 'idle'
+DISCONNECTED = 'disconnected'
+
+# Seconds between two polls of a device, by what its last poll showed.
+DEFAULT_POLL_INTERVALS = {
+    ACTIVE: 30,
+    IDLE: 300,
+    DISCONNECTED: 900,
+}
+
+
+class PolledDevice:
+    """One appliance polled by the coordinator.
+
+    Holds the wideq device wrapper and the last decoded status, and fans
+    that status out to every subscribed entity.
+    """
+
+    def __init__(self, device, status_type, is_active):
+        self.device = device
+        self.status_type = status_type
+        self.is_active = is_active
+        self.status = None
+        self.disconnected_count = 0
+        self._listeners = []
+
+    @property
+    def device_id(self):
+        return self.device.device.id
+
+    @property
+    def kind(self):
+        """The device type name used to configure its poll intervals."""
+        return self.device.device.type.name.lower()
+
+    def subscribe(self, listener):
+        """Call `listener(status)` after every poll of this device.
+
+        Returns a function that removes the listener again.
+        """
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    @callback
+    def async_set_status(self, status):
+        self.status = status
+        for listener in list(self._listeners):
+            listener(status)
+
+
+class SmartThinQCoordinator:
+    """Owns the polling schedule for all appliances of one account.
+
+    Each device's monitor is polled once per interval no matter how many
+    entities show it, and the first polls of the devices are spread STAGGER
+    seconds apart so they do not reach the cloud in one burst.
+
+    The interval follows the last poll: ACTIVE while a cycle is running,
+    IDLE when the device is off or finished and DISCONNECTED when the cloud
+    cannot reach it. `poll_intervals` overrides the defaults per device
+    type, e.g. `{'washer': {'idle': 600}}`.
+
+    An unreachable device is probed with exponential backoff, starting at
+    its ACTIVE interval and doubling up to its DISCONNECTED interval, with
+    jitter so idle appliances do not line up. The first poll that reaches
+    the device again resets the backoff.
+
+    Devices can be registered before the integration has logged in; their
+    polling only begins once `async_start` is called.
+
+    When the LG session expires, `async_refresh` makes sure only one
+    refresh runs; every other caller waits for it, and the monitors of all
+    devices are then restarted together. The monitors themselves belong to
+    `monitors`, a MonitorManager.
+    """
+
+    def __init__(self, hass, transport, poll_intervals=None):
+        self.hass = hass
+        self.transport = transport
+        self.monitors = MonitorManager(transport)
+        self._poll_intervals = poll_intervals or {}
+        self._devices = {}
+        self._refresh_task = None
+        self._started = False
+
+    def poll_interval(self, polled, activity):
+        """Seconds until the next poll of a device in `activity`."""
+        intervals = self._poll_intervals.get(polled.kind, {})
+        return intervals.get(activity, DEFAULT_POLL_INTERVALS[activity])
+
+    def next_delay(self, polled, activity):
+        """Seconds until the next poll, applying the disconnected backoff."""
+        if activity != DISCONNECTED:
+            polled.disconnected_count = 0
+            return self.poll_interval(polled, activity)
+
+        polled.disconnected_count += 1
+        exponent = min(polled.disconnected_count - 1, 16)
+        delay = min(self.poll_interval(polled, ACTIVE) * 2 ** exponent,
+                    self.poll_interval(polled, DISCONNECTED))
+        return delay * (1 - BACKOFF_JITTER * random.random())
+
+    def register(self, device, wrapper_type, status_type, is_active):
+        """Return the PolledDevice for a DeviceInfo, creating it and
+        scheduling its first poll if this is the first entity asking and
+        polling has started. `is_active(status)` tells whether a status
+        shows a running cycle.
+
+        This must not make any API calls; like the entity constructors it
+        runs during platform setup, when the appliance may be offline.
+        """
+        polled = self._devices.get(device.id)
+        if polled is None:
+            polled = PolledDevice(
+                self.transport.compile_lookups(
+                    wrapper_type(self.transport.client, device)),
+                status_type, is_active)
+            self._devices[device.id] = polled
+            if self._started:
+                self._schedule_first(polled, len(self._devices) - 1)
+        return polled
+
+    @callback
+    def async_start(self):
+        """Begin polling the registered devices, and any registered later.
+
+        Call this once the transport has logged in.
+        """
+        if self._started:
+            return
+        self._started = True
+        for index, polled in enumerate(self._devices.values()):
+            self._schedule_first(polled, index)
+
+    def _schedule_first(self, polled, index):
+        self._schedule(polled, ((STAGGER * index) %
+                                self.poll_interval(polled, ACTIVE)))
+
+    async def async_refresh(self, expired_session):
+        """Refresh the session that raised NotLoggedInError.
+
+        `expired_session` is the session the failed call used. If it has
+        already been replaced there is nothing to do; if a refresh is
+        running, wait for that one instead of starting another.
+        """
+        if self.transport.client.session is not expired_session:
+            return
+        if self._refresh_task is None:
+            self._refresh_task = self.hass.async_create_task(
+                self._async_refresh())
+        task = self._refresh_task
+        try:
+            await asyncio.shield(task)
+        finally:
+            if self._refresh_task is task and task.done():
+                self._refresh_task = None
+
+    async def _async_refresh(self):
+        LOGGER.info('Session expired. Refreshing.')
+        await self.transport.async_refresh()
+
+        # Monitors started under the old session were interrupted, so
+        # restart them all in one batch.
+        await self.monitors.async_restart_all()
+
+    def _schedule(self, polled, delay):
+        async def _async_poll_later(now):
+            activity = ACTIVE
+            try:
+                activity = await self._async_poll(polled)
+            except (aiohttp.ClientError, asyncio.TimeoutError,
+                    wideq.APIError) as ex:
+                LOGGER.warning('Polling %s failed: %r',
+                               polled.device.device.name, ex)
+            finally:
+                self._schedule(polled, self.next_delay(polled, activity))
+
+        async_call_later(self.hass, delay, _async_poll_later)
+
+    async def _async_poll(self, polled):
+        """Poll one device and publish its status.
+
+        Returns ACTIVE, IDLE or DISCONNECTED to pick the next interval.
+        Polls that could not produce a status yet count as ACTIVE so the
+        monitor warm-up and session refreshes are retried quickly.
+        """
+
+        # If an error occurs, it will naturally be retried on the next poll.
+
+        LOGGER.debug('Updating %s.', polled.device.device.name)
+
+        session = self.transport.client.session
+        try:
+            status = await self.monitors.async_poll(
+                polled.device, polled.status_type)
+        except wideq.NotConnectedError:
+            polled.async_set_status(None)
+            return DISCONNECTED
+        except wideq.NotLoggedInError:
+            # The refresh restarts this device's monitor with the others.
+            await self.async_refresh(session)
+            return ACTIVE
+
+        if status:
+            LOGGER.debug('Status updated.')
+            polled.async_set_status(status)
+            return ACTIVE if polled.is_active(status) else IDLE
+
+        LOGGER.debug('No status available yet.')
+        return ACTIVE
@@ -0,0 +1,129 @@
+"""
+Decoding of LG monitor payloads and model info lookups.
+"""
+import json
+import struct
+
+from wideq.client import LangPackModel, LangPackProduct, ModelInfo
+
+# struct codes of the big-endian unsigned fields binary protocols use.
+STRUCT_CODES = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+
+def _compile_binary(protocol):
+    """Compile a binary monitoring protocol into one struct layout.
+
+    Returns a function decoding a payload into the dict
+    `ModelInfo.decode_monitor_binary` returns, or None for a payload too
+    short for the layout. Returns None instead of a function if a field
+    does not fit a struct layout, e.g. when fields overlap.
+    """
+    # wideq decodes the fields in protocol order, so of fields sharing a
+    # name the last one wins; the others are skipped like padding.
+    last = {item['value']: index for index, item in enumerate(protocol)}
+    fields = sorted((item for index, item in enumerate(protocol)
+                     if last[item['value']] == index),
+                    key=lambda item: item['startByte'])
+    fmt = ['>']
+    offset = 0
+    for item in fields:
+        start, length = item['startByte'], item['length']
+        if start < offset or length not in STRUCT_CODES:
+            return None
+        if start > offset:
+            fmt.append('{}x'.format(start - offset))
+        fmt.append(STRUCT_CODES[length])
+        offset = start + length
+    layout = struct.Struct(''.join(fmt))
+    keys = tuple(item['value'] for item in fields)
+
+    def decode(data):
+        if len(data) < layout.size:
+            return None
+        return dict(zip(keys, map(str, layout.unpack_from(data))))
+
+    return decode
+
+
+class MonitorDecoder:
+    """Decodes the monitor payloads of one model like
+    `ModelInfo.decode_monitor` does.
+
+    A binary protocol is compiled into a single struct layout once, instead
+    of walking it byte by byte for every payload; protocols or payloads the
+    layout cannot express fall back to wideq's decoder. JSON payloads are
+    parsed straight from the bytes.
+    """
+
+    def __init__(self, model):
+        self._model = model
+        self._binary = None
+        if model.binary_monitor_data:
+            self._binary = (
+                _compile_binary(model.data['Monitoring']['protocol']) or
+                model.decode_monitor_binary)
+
+    def decode(self, data):
+        if self._binary is None:
+            return json.loads(data)
+        decoded = self._binary(data)
+        if decoded is None:
+            decoded = self._model.decode_monitor_binary(data)
+        return decoded
+
+
+class _CompiledLookups:
+    """Builds each value description once and keeps it.
+
+    wideq rebuilds a value's description, e.g. an enum's option map, from
+    the raw document on every lookup, and the inverse map on every reverse
+    lookup; decoding one status does that for every field, and again for
+    its language packs. Kept per key, a label is then a dictionary read.
+    """
+
+    def __init__(self, data):
+        super().__init__(data)
+        self._values = {}
+        self._inverse = {}
+
+    def invalidate(self):
+        """Drop the compiled descriptions, e.g. after the document was
+        updated in place to a new version.
+        """
+        self._values.clear()
+        self._inverse.clear()
+
+    def value(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            value = self._values[name] = super().value(name)
+            return value
+
+    def _options(self, key):
+        return self.value(key).options
+
+    def enum_value(self, key, name):
+        inverse = self._inverse.get(key)
+        if inverse is None:
+            inverse = self._inverse[key] = {
+                label: value for value, label in self._options(key).items()}
+        return inverse[name]
+
+
+class CompiledModelInfo(_CompiledLookups, ModelInfo):
+    """A ModelInfo whose lookups are compiled on first use."""
+
+
+class CompiledLangPackProduct(_CompiledLookups, LangPackProduct):
+    """A LangPackProduct whose lookups are compiled on first use."""
+
+    def _options(self, key):
+        return self.value(key).packs
+
+
+class CompiledLangPackModel(_CompiledLookups, LangPackModel):
+    """A LangPackModel whose lookups are compiled on first use."""
+
+    def _options(self, key):
+        return self.value(key).packs
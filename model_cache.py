@@ -0,0 +1,120 @@
+"""
+On-disk cache of LG model info and language packs.
+"""
+import asyncio
+import functools
+import logging
+
+import aiohttp
+from homeassistant.helpers.storage import Store
+
+LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = 'smartthinq.{}.{}'
+STORAGE_VERSION = 1
+
+# The documents a wideq device wrapper needs: the client cache they go in,
+# the device list fields with their URL, their version and the name that
+# devices sharing the document have in common, and a key any valid copy of
+# the document has.
+DOCUMENTS = (
+    ('_model_info', 'modelJsonUrl', 'modelJsonVer', 'modelNm',
+     'Monitoring'),
+    ('_lang_pack_product', 'langPackProductTypeUri',
+     'langPackProductTypeVer', 'deviceType', 'pack'),
+    ('_lang_pack_model', 'langPackModelUri', 'langPackModelVer', 'modelNm',
+     'pack'),
+)
+
+
+def _is_valid(data, required):
+    return isinstance(data, dict) and required in data
+
+
+class ModelInfoCache:
+    """Model info and language packs stored in HA's storage.
+
+    Each document is stored once per model (or product type for the
+    product language pack) and loaded from disk the first time a device
+    needs it. A stored copy whose version differs from the one the device
+    reports is used right away and replaced in the background.
+    """
+
+    def __init__(self, hass, transport):
+        self.hass = hass
+        self.transport = transport
+        self._loading = {}
+
+    async def async_model_info(self, device):
+        """Fill the client's caches for a DeviceInfo and return its
+        ModelInfo, so the wideq wrappers can be built without HTTP.
+        """
+        client = self.transport.client
+        for attr, url_key, version_key, name_key, required in DOCUMENTS:
+            cache = getattr(client, attr)
+            url = device.data.get(url_key)
+            if url in cache:
+                continue
+            if not url:
+                # wideq uses the string 'None' for models without a pack.
+                cache[url] = 'None'
+                continue
+
+            key = STORAGE_KEY.format(attr.lstrip('_'), device.data[name_key])
+            version = str(device.data.get(version_key, url))
+            task = self._loading.get((key, version))
+            if task is None:
+                # Devices of the same model share one load.
+                task = self.hass.async_create_task(
+                    self._async_load(key, url, version, required))
+                task.add_done_callback(
+                    functools.partial(self._load_done, (key, version)))
+                self._loading[(key, version)] = task
+            cache[url] = await task
+
+        return client.model_info(device)
+
+    def _load_done(self, loading_key, task):
+        # Keep a failed load from being reused, so the next lookup retries.
+        if task.cancelled() or task.exception() is not None:
+            del self._loading[loading_key]
+
+    async def _async_download(self, url, required):
+        # An error page that parses as JSON must not be stored, or the
+        # model stays broken until its version changes.
+        data = await self.transport.async_get_json(url)
+        if not _is_valid(data, required):
+            raise ValueError('{} is not a valid document.'.format(url))
+        return data
+
+    async def _async_load(self, key, url, version, required):
+        store = Store(self.hass, STORAGE_VERSION, key)
+        stored = await store.async_load()
+        if stored is None or not _is_valid(stored['data'], required):
+            LOGGER.debug('Downloading %s.', key)
+            data = await self._async_download(url, required)
+            await store.async_save(
+                {'version': version, 'url': url, 'data': data})
+            return data
+
+        if stored['version'] != version:
+            self.hass.async_create_task(self._async_update(
+                store, stored['data'], url, version, required))
+        return stored['data']
+
+    async def _async_update(self, store, data, url, version, required):
+        LOGGER.debug('Updating %s to version %s.', store.key, version)
+        try:
+            new_data = await self._async_download(url, required)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as ex:
+            LOGGER.warning('Updating %s failed: %r', store.key, ex)
+            return
+        await store.async_save(
+            {'version': version, 'url': url, 'data': new_data})
+
+        # The wrappers keep the dict they were built from, so update it in
+        # place for them to see the new version, and recompile what was
+        # compiled from the old one.
+        data.clear()
+        data.update(new_data)
+        self.transport.invalidate_lookups(url)
@@ -0,0 +1,166 @@
+"""
+Lifecycle of the LG monitoring sessions.
+"""
+import asyncio
+import logging
+
+import aiohttp
+import wideq
+
+LOGGER = logging.getLogger(__name__)
+
+MAX_EMPTY_POLLS = 5
+STOP_TIMEOUT = 10  # Seconds to spend stopping the monitors on shutdown.
+
+
+class MonitorManager:
+    """Owns the monitoring session (the rtiMon work ID) of every device.
+
+    A device's monitor is started on its first poll and kept for as long as
+    it is healthy. Health is judged from the result of every poll, so it
+    costs no extra requests: a monitor the API reports as failed is
+    replaced, and so is one that returned no data for MAX_EMPTY_POLLS polls
+    in a row. A replacement is started before the old monitor is stopped, so
+    the device is never left unmonitored.
+
+    After a session refresh all monitors are restarted in one batch, and
+    when Home Assistant stops they are all stopped. The work IDs are also
+    kept with the integration's stored state, so any left over by an
+    unclean shutdown are stopped on the next start.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self._devices = {}
+        self._empty_polls = {}
+        self._orphans = {}
+        self._listeners = []
+        self._stopped = False
+
+    def restore(self, work_ids):
+        """Remember the work IDs `dump` returned before a restart."""
+        self._orphans = dict(work_ids or {})
+
+    def dump(self):
+        """The work IDs of the running monitors, by device ID."""
+        return {device_id: device.mon.work_id
+                for device_id, device in self._devices.items()
+                if getattr(device, 'mon', None) is not None}
+
+    def add_listener(self, listener):
+        """Call `listener()` whenever a monitor was started or stopped."""
+        self._listeners.append(listener)
+
+    def _changed(self):
+        for listener in self._listeners:
+            listener()
+
+    async def async_poll(self, device, status_type):
+        """Poll a device wrapper, starting or replacing its monitor as
+        needed. Returns None while there is no status yet.
+
+        Raises NotConnectedError if the device is offline and
+        NotLoggedInError if the session expired.
+        """
+        if self._stopped:
+            return None
+        device_id = device.device.id
+        if getattr(device, 'mon', None) is None:
+            await self._async_start(device)
+
+        try:
+            status = await self.transport.async_poll(device, status_type)
+        except wideq.MonitorError as ex:
+            LOGGER.debug('Monitor for %s failed with %s, replacing it.',
+                         device_id, ex.code)
+            await self._async_replace(device)
+            return None
+
+        if status is not None:
+            self._empty_polls[device_id] = 0
+            return status
+
+        self._empty_polls[device_id] = self._empty_polls.get(device_id, 0) + 1
+        if self._empty_polls[device_id] >= MAX_EMPTY_POLLS:
+            # We tried several times but got no result. This might happen
+            # when the monitoring request gets into a bad state.
+            LOGGER.debug('No data from the monitor for %s, replacing it.',
+                         device_id)
+            await self._async_replace(device)
+        return None
+
+    async def _async_start(self, device):
+        await self.transport.async_monitor_start(device)
+        self._devices[device.device.id] = device
+        self._empty_polls[device.device.id] = 0
+        self._changed()
+
+    async def _async_replace(self, device):
+        old = device.mon
+        await self._async_start(device)
+        await self._async_stop(old)
+
+    async def _async_stop(self, mon):
+        """Stop a monitor. Returns whether it was stopped."""
+        try:
+            await self.transport.async_monitor_stop(mon)
+        except (aiohttp.ClientError, asyncio.TimeoutError,
+                wideq.APIError) as ex:
+            # The server drops monitors it has not been asked about for a
+            # while, so this is not worth retrying.
+            LOGGER.debug('Stopping the monitor %s failed: %r',
+                         mon.work_id, ex)
+            return False
+        return True
+
+    async def async_restart_all(self):
+        """Start new monitors for every monitored device, e.g. after the
+        session they were started in expired.
+        """
+        devices = [device for device in self._devices.values()
+                   if getattr(device, 'mon', None) is not None]
+        results = await asyncio.gather(
+            *(self.transport.async_monitor_start(device)
+              for device in devices),
+            return_exceptions=True)
+        for device, result in zip(devices, results):
+            self._empty_polls[device.device.id] = 0
+            if isinstance(result, Exception):
+                # Start it again on the device's next poll.
+                LOGGER.debug('Restarting the monitor of %s failed: %r',
+                             device.device.name, result)
+                device.mon = None
+        self._changed()
+
+    async def async_stop_orphans(self):
+        """Stop the monitors a previous run left behind."""
+        orphans, self._orphans = self._orphans, {}
+        monitors = []
+        for device_id, work_id in orphans.items():
+            mon = wideq.Monitor(self.transport.client.session, device_id)
+            mon.work_id = work_id
+            monitors.append(mon)
+        await asyncio.gather(*(self._async_stop(mon) for mon in monitors))
+
+    async def async_stop_all(self, event=None):
+        """Stop every monitor and start no new ones, e.g. on shutdown."""
+        self._stopped = True
+        devices = [device for device in self._devices.values()
+                   if getattr(device, 'mon', None) is not None]
+
+        async def _async_stop_device(device):
+            # A monitor that could not be stopped stays in the stored
+            # state, so the next start stops it.
+            if await self._async_stop(device.mon):
+                device.mon = None
+
+        if devices:
+            LOGGER.debug('Stopping %d monitors.', len(devices))
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(_async_stop_device(device)
+                                     for device in devices)),
+                    STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                LOGGER.warning('Stopping the monitors timed out.')
+            self._changed()
@@ -1,21 +1,26 @@
 import datetime
+import functools
 import logging
+import operator
 import time
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
 
+from homeassistant.const import ATTR_ENTITY_ID, ATTR_NAME
+from homeassistant.core import callback
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_call_later
 from custom_components.smartthinq import (
-    CONF_LANGUAGE, KEY_SMARTTHINQ_DEVICES, LGDevice)
-from homeassistant.const import CONF_REGION, CONF_TOKEN
+    KEY_SMARTTHINQ_COORDINATOR, LGDevice, async_load_devices)
 
 KEY_WW_OFF = '꺼짐'
-KEY_WW_UNSUPPORT = '미지원'
 
 REQUIREMENTS = ['wideq']
 import wideq
 from wideq import dryer
 from wideq import washer
 from wideq import dishwasher
+from wideq.util import lookup_enum
 
 ATTR_WW_STATE = 'state'
 ATTR_WW_DEVICETYPE = 'type'
@@ -64,35 +69,80 @@ ATTR_DW_RESERVE_TIME_IN_MINUTES = 'reserve_time_in_minutes'
 ATTR_DW_COURSE = 'course'
 ATTR_DW_ERROR = 'error'
 ATTR_DW_DEVICE_TYPE = 'device_type'
-MAX_RETRIES = 5
 
 KEY_DW_OFF = 'Off'
 KEY_DW_DISCONNECTED = 'Disconnected'
+
+# Fired on the bus when a dryer, washer or dishwasher starts or finishes
+# a cycle, moves to another process of it, or reports a new error.
+EVENT_CYCLE_STARTED = 'smartthinq_cycle_started'
+EVENT_PROCESS_CHANGED = 'smartthinq_process_changed'
+EVENT_CYCLE_FINISHED = 'smartthinq_cycle_finished'
+EVENT_ERROR = 'smartthinq_error'
+
+ATTR_EVENT_DEVICE_TYPE = 'device_type'
+ATTR_EVENT_PROCESS = 'process'
+ATTR_EVENT_PREVIOUS_PROCESS = 'previous_process'
+
+COUNTDOWN_TICK = 60  # Seconds per minute of the local countdown.
+
+# States of a dryer or washer, as named in its model info, in which the
+# remaining time stands still.
+WW_HOLD_STATES = ('@WM_STATE_INITIAL_W', '@WM_STATE_PAUSE_W',
+                  '@WM_STATE_RESERVE_W', '@WM_STATE_ERROR_W')
+DW_HOLD_STATES = (dishwasher.DishWasherState.INITIAL,
+                  dishwasher.DishWasherState.PAUSED,
+                  dishwasher.DishWasherState.POWER_FAIL)
+
+ICON_DRYER = 'mdi:tumble-dryer'
+ICON_WASHER = 'mdi:washing-machine'
+ICON_DISHWASHER = 'mdi:dishwasher'
+
+# Icons and units of the per-attribute sensors. Attributes not listed use
+# their appliance's icon.
+ATTRIBUTE_ICONS = {
+    ATTR_WW_REMAINING_TIME: 'mdi:clock-outline',
+    ATTR_WW_REMAINING_TIME_IN_MINUTES: 'mdi:clock-outline',
+    ATTR_WW_INITIAL_TIME: 'mdi:clock-outline',
+    ATTR_WW_INITIAL_TIME_IN_MINUTES: 'mdi:clock-outline',
+    ATTR_WW_RESERVE_TIME: 'mdi:camera-timer',
+    ATTR_WW_RESERVE_TIME_IN_MINUTES: 'mdi:camera-timer',
+    ATTR_WW_COURSE: 'mdi:pin-outline',
+    ATTR_WW_SMARTCOURSE: 'mdi:pin-outline',
+    ATTR_WW_ERROR: 'mdi:alert-circle-outline',
+    ATTR_WW_DRYLEVEL: 'mdi:gauge',
+    ATTR_WW_ECOHYBRID: 'mdi:power-plug-off',
+    ATTR_WW_CHILDLOCK: 'mdi:lock-outline',
+    ATTR_WW_DOORLOCK: 'mdi:lock-outline',
+    ATTR_WW_DAMPDRYBEEP: 'mdi:bell-outline',
+    ATTR_WW_BUZZER: 'mdi:bell-outline',
+}
+ATTRIBUTE_UNITS = {
+    ATTR_WW_REMAINING_TIME_IN_MINUTES: 'min',
+    ATTR_WW_INITIAL_TIME_IN_MINUTES: 'min',
+    ATTR_WW_RESERVE_TIME_IN_MINUTES: 'min',
+    ATTR_WW_TUBCLEANCOUNT: '회',
+}
 LOGGER = logging.getLogger(__name__)
 
 
-def setup_platform(hass, config, add_devices, discovery_info=None):
+async def async_setup_platform(hass, config, add_devices, discovery_info=None):
     """Set up the LG entities"""
 
-    refresh_token = hass.data[CONF_TOKEN]
-    region = hass.data[CONF_REGION]
-    language = hass.data[CONF_LANGUAGE]
-
-    client = wideq.Client.from_token(refresh_token, region, language)
-    dryers = []
-    washers = []
-    dishwashers = []
-
-    for device_id in hass.data[KEY_SMARTTHINQ_DEVICES]:
-        device = client.get_device(device_id)
-		model = client.model_info(device)
-        LOGGER.debug("Device: %s" % device.type)
+    coordinator = hass.data[KEY_SMARTTHINQ_COORDINATOR]
 
+    # Devices arrive as soon as their model info is loaded, and are added
+    # right away, so one slow download does not hold up the others.
+    async for device in async_load_devices(
+            hass, (wideq.DeviceType.DRYER, wideq.DeviceType.WASHER,
+                   wideq.DeviceType.DISHWASHER)):
+        entity = None
         if device.type == wideq.DeviceType.DRYER:
             base_name = "lg_dryer_" + device.name
             LOGGER.debug("Creating new LG Dryer: %s" % base_name)
             try:
-                dryers.append(LGDryerDevice(client, device, base_name))
+                entity = LGDryerDevice(coordinator, device, base_name)
+                icon = ICON_DRYER
             except wideq.NotConnectedError:
                 # Dryers are only connected when in use. Ignore
                 # NotConnectedError on platform setup.
@@ -102,7 +152,8 @@ def setup_platform(hass, config, add_devices, discovery_info=None):
             base_name = "lg_washer_" + device.name
             LOGGER.debug("Creating new LG Washer: %s" % base_name)
             try:
-                washers.append(LGWasherDevice(client, device, base_name))
+                entity = LGWasherDevice(coordinator, device, base_name)
+                icon = ICON_WASHER
             except wideq.NotConnectedError:
                 # Washers are only connected when in use. Ignore
                 # NotConnectedError on platform setup.
@@ -112,64 +163,357 @@ def setup_platform(hass, config, add_devices, discovery_info=None):
             base_name = "lg_dishwasher_" + device.name
             LOGGER.debug("Creating new LG DishWasher: %s" % base_name)
             try:
-                dishwashers.append(LGDishWasherDevice(client, device, base_name))
+                entity = LGDishWasherDevice(coordinator, device, base_name)
+                icon = ICON_DISHWASHER
             except wideq.NotConnectedError:
                 # Dishwashers are only connected when in use. Ignore
                 # NotConnectedError on platform setup.
                 pass
 
-    if dryers:
-        add_devices(dryers, True)
-    if washers:
-        add_devices(washers, True)
-    if dishwashers:
-        add_devices(dishwashers, True)	
-			
+        if entity is not None:
+            add_devices([entity] + _attribute_sensors(entity, icon))
+
     return True
 
 
-class LGDryerDevice(LGDevice):
-    def __init__(self, client, device, name):
+@functools.lru_cache(maxsize=2048)
+def _hhmm(minutes):
+    # Every status formats several times; minutes take few distinct values.
+    return str(datetime.timedelta(minutes=minutes))[:-3]
+
+
+def _compile_attributes(table):
+    """Compile an attribute table into a function returning the attributes
+    of a status, or of an unreachable device for None.
+
+    Each entry is (attribute, source, unreachable value[, format]), where
+    the source is a status property name or a function of the status. Every
+    source is read once per status, however many attributes use it.
+    """
+    sources = []
+    plan = []
+    unreachable = {}
+    for attribute, source, default, *fmt in table:
+        fmt = fmt[0] if fmt else None
+        if source not in sources:
+            sources.append(source)
+        plan.append((attribute, sources.index(source), fmt))
+        unreachable[attribute] = fmt(default) if fmt else default
+    reads = tuple(operator.attrgetter(source) if isinstance(source, str)
+                  else source for source in sources)
+
+    def project(status):
+        if not status:
+            return dict(unreachable)
+        values = [read(status) for read in reads]
+        return {attribute: fmt(values[index]) if fmt else values[index]
+                for attribute, index, fmt in plan}
+
+    return project
+
+
+DRYER_ATTRIBUTES = _compile_attributes((
+    (ATTR_WW_REMAINING_TIME, 'remaining_time', 0, _hhmm),
+    (ATTR_WW_REMAINING_TIME_IN_MINUTES, 'remaining_time', 0),
+    (ATTR_WW_INITIAL_TIME, 'initial_time', 0, _hhmm),
+    (ATTR_WW_INITIAL_TIME_IN_MINUTES, 'initial_time', 0),
+    (ATTR_WW_RESERVE_TIME, 'reserve_time', 0, _hhmm),
+    (ATTR_WW_RESERVE_TIME_IN_MINUTES, 'reserve_time', 0),
+    (ATTR_WW_PROCESSSTATE, 'process_state', KEY_WW_OFF),
+    (ATTR_WW_COURSE, 'course', KEY_WW_OFF),
+    (ATTR_WW_SMARTCOURSE, 'smart_course', KEY_WW_OFF),
+    (ATTR_WW_ERROR, 'error', KEY_WW_OFF),
+    (ATTR_WW_DRYLEVEL, 'dry_level', KEY_WW_OFF),
+    (ATTR_WW_ECOHYBRID, 'eco_hybrid', KEY_WW_OFF),
+    (ATTR_WW_ANTICREASE, 'anti_crease', KEY_WW_OFF),
+    (ATTR_WW_CHILDLOCK, 'child_lock', KEY_WW_OFF),
+    (ATTR_WW_SELFCLEANING, 'self_cleaning', KEY_WW_OFF),
+    (ATTR_WW_DAMPDRYBEEP, 'damp_dry_beep', KEY_WW_OFF),
+    (ATTR_WW_HANDIRON, 'hand_iron', KEY_WW_OFF),
+    # For convenience, include the state as an attribute.
+    (ATTR_WW_STATE, 'state', KEY_WW_OFF),
+))
+
+WASHER_COMMON = (
+    (ATTR_WW_DEVICETYPE, 'device_type', KEY_WW_OFF),
+    (ATTR_WW_REMAINING_TIME, 'remaining_time', 0, _hhmm),
+    (ATTR_WW_REMAINING_TIME_IN_MINUTES, 'remaining_time', 0),
+    (ATTR_WW_INITIAL_TIME, 'initial_time', 0, _hhmm),
+    (ATTR_WW_INITIAL_TIME_IN_MINUTES, 'initial_time', 0),
+    (ATTR_WW_RESERVE_TIME, 'reserve_time', 0, _hhmm),
+    (ATTR_WW_RESERVE_TIME_IN_MINUTES, 'reserve_time', 0),
+    (ATTR_WW_PREVIOUSSTATE, 'previous_state', KEY_WW_OFF),
+    (ATTR_WW_COURSE, 'course', KEY_WW_OFF),
+    (ATTR_WW_SMARTCOURSE, 'smart_course', KEY_WW_OFF),
+    (ATTR_WW_ERROR, 'error', KEY_WW_OFF),
+    (ATTR_WW_SOILLEVEL, 'soil_level', KEY_WW_OFF),
+    (ATTR_WW_WATERTEMP, 'water_temp', KEY_WW_OFF),
+    (ATTR_WW_SPINSPEED, 'spin_speed', KEY_WW_OFF),
+    (ATTR_WW_RINSECOUNT, 'rinse_count', KEY_WW_OFF),
+    # For convenience, include the state as an attribute.
+    (ATTR_WW_STATE, 'state', KEY_WW_OFF),
+)
+
+# Options that wideq reports as unsupported for the other washer variant
+# are left out of that variant's table altogether.
+WASHER_ATTRIBUTES = {
+    'FL': _compile_attributes(WASHER_COMMON + (
+        (ATTR_WW_CHILDLOCK, 'child_lock', KEY_WW_OFF),
+        (ATTR_WW_STEAM, 'steam', KEY_WW_OFF),
+        (ATTR_WW_TURBOSHOT, 'turbo_shot', KEY_WW_OFF),
+        (ATTR_WW_DRYLEVEL, 'dry_level', KEY_WW_OFF),
+        (ATTR_WW_FRESHCARE, 'fresh_care', KEY_WW_OFF),
+        (ATTR_WW_TUBCLEANCOUNT, 'tubclean_count', KEY_WW_OFF),
+        (ATTR_WW_LOADLEVEL, 'load_level', KEY_WW_OFF),
+    )),
+    'TL': _compile_attributes(WASHER_COMMON + (
+        (ATTR_WW_CHILDLOCK, 'child_lock', KEY_WW_OFF),
+        (ATTR_WW_STEAM, 'steam', KEY_WW_OFF),
+        (ATTR_WW_TURBOSHOT, 'turbo_shot', KEY_WW_OFF),
+        (ATTR_WW_WATERLEVEL, 'water_level', KEY_WW_OFF),
+        (ATTR_WW_WATERFLOW, 'water_flow', KEY_WW_OFF),
+        (ATTR_WW_SOAK, 'soak', KEY_WW_OFF),
+        (ATTR_WW_DOORLOCK, 'door_lock', KEY_WW_OFF),
+        (ATTR_WW_BUZZER, 'buzzer', KEY_WW_OFF),
+        (ATTR_WW_STERILIZE, 'sterilize', KEY_WW_OFF),
+        (ATTR_WW_HEATER, 'heater', KEY_WW_OFF),
+    )),
+}
+# wideq only knows the option bits of the two variants above.
+WASHER_OTHER_ATTRIBUTES = _compile_attributes(WASHER_COMMON)
+
+
+def _dw_remaining_time(status):
+    # The API (indefinitely) returns 1 minute remaining when a cycle is
+    # either in state off or complete, or process night-drying. Return 0
+    # minutes remaining in these instances, which is more reflective of
+    # reality.
+    if (status.process == dishwasher.DishWasherProcess.NIGHT_DRYING or
+            status.state in (dishwasher.DishWasherState.OFF,
+                             dishwasher.DishWasherState.COMPLETE)):
+        return 0
+    return status.remaining_time
+
+
+def _dw_initial_time(status):
+    # When in state OFF, the dishwasher still returns the initial program
+    # length of the previously ran cycle. Instead, return 0 which is more
+    # reflective of the dishwasher being off.
+    if status.state == dishwasher.DishWasherState.OFF:
+        return 0
+    return status.initial_time
+
+
+def _dw_course(status):
+    if status.smart_course != KEY_DW_OFF:
+        return status.smart_course
+    return status.course
+
+
+def _dw_state(status):
+    # Process is a more refined string to use for state, if it's present,
+    # use it instead.
+    return status.readable_process or status.readable_state
+
+
+DISHWASHER_ATTRIBUTES = _compile_attributes((
+    (ATTR_DW_REMAINING_TIME, _dw_remaining_time, 0, _hhmm),
+    (ATTR_DW_REMAINING_TIME_IN_MINUTES, _dw_remaining_time, 0),
+    (ATTR_DW_INITIAL_TIME, _dw_initial_time, 0, _hhmm),
+    (ATTR_DW_INITIAL_TIME_IN_MINUTES, _dw_initial_time, 0),
+    (ATTR_DW_RESERVE_TIME, 'reserve_time', 0, _hhmm),
+    (ATTR_DW_RESERVE_TIME_IN_MINUTES, 'reserve_time', 0),
+    (ATTR_DW_COURSE, _dw_course, KEY_DW_OFF),
+    (ATTR_DW_ERROR, 'error', KEY_DW_DISCONNECTED),
+    # For convenience, include the state as an attribute.
+    (ATTR_DW_STATE, _dw_state,
+     dishwasher.DISHWASHER_STATE_READABLE[
+         dishwasher.DishWasherState.OFF.name]),
+))
+
+
+class LGCycleDevice(LGDevice):
+    """An appliance that runs cycles, firing the EVENT_* events on the bus
+    as its status moves between them.
+
+    Transitions are found by comparing the attribute snapshots of the last
+    two statuses that reached the appliance; the first status after startup
+    only sets the baseline, so a restart does not fire anything. A running
+    appliance that becomes unreachable has finished its cycle, since
+    dryers and washers are only connected while in use.
+
+    While a cycle runs, the remaining time counts down locally every minute
+    from the last value the appliance reported, and every poll starts it
+    over from the value it reported, so the dashboard keeps ticking however
+    long the active poll interval is. It does not count down while the
+    cycle is paused or on standby.
+    """
+
+    DEVICE_TYPE = None
+    # The attribute naming the current step of a cycle.
+    PROCESS_ATTRIBUTE = None
+    COURSE_ATTRIBUTE = ATTR_WW_COURSE
+    ERROR_ATTRIBUTE = ATTR_WW_ERROR
+    # Error values that mean there is none.
+    NO_ERRORS = ('없음', KEY_WW_OFF)
+    REMAINING_ATTRIBUTE = ATTR_WW_REMAINING_TIME
+    REMAINING_MINUTES_ATTRIBUTE = ATTR_WW_REMAINING_TIME_IN_MINUTES
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._attribute_table = None
+        self._cycle_attributes = None
+        self._running = False
+        # The last remaining minutes reported, and since when.
+        self._countdown = None
+        self._unsub_tick = None
+
+    def is_counting(self, status):
+        """Whether the appliance counts the remaining time of a running
+        cycle down, i.e. is not paused or on standby.
+        """
+        return True
+
+    def _build_attributes(self, status):
+        attributes = self._attribute_table(status)
+        if (status is None or not self.is_active(status) or
+                not self.is_counting(status)):
+            self._countdown = None
+            return attributes
+
+        reported = attributes[self.REMAINING_MINUTES_ATTRIBUTE]
+        if self._countdown is None:
+            self._countdown = (reported, time.monotonic())
+        elapsed = int((time.monotonic() - self._countdown[1]) //
+                      COUNTDOWN_TICK)
+        # Only the appliance knows when it is done, so stop at a minute.
+        remaining = max(reported - elapsed, min(reported, 1))
+        attributes[self.REMAINING_MINUTES_ATTRIBUTE] = remaining
+        attributes[self.REMAINING_ATTRIBUTE] = _hhmm(remaining)
+        return attributes
+
+    def _schedule_tick(self):
+        if self._unsub_tick:
+            self._unsub_tick()
+            self._unsub_tick = None
+        if (self._status is None or self._countdown is None or
+                self._countdown[0] <= 1 or self.hass is None):
+            return
+        elapsed = time.monotonic() - self._countdown[1]
+        self._unsub_tick = async_call_later(
+            self.hass, COUNTDOWN_TICK - elapsed % COUNTDOWN_TICK,
+            self._async_tick)
+
+    @callback
+    def _status_updated(self, status):
+        # Every poll restarts the countdown from the time it reported, also
+        # one repeating the last status, so a paused or stalled cycle is
+        # corrected instead of counting on.
+        self._countdown = None
+        super()._status_updated(status)
+
+    def _status_repeated(self):
+        if (self._status is not None and self.is_active(self._status) and
+                self._update_attributes()):
+            self.async_schedule_update_ha_state()
+
+    @callback
+    def _async_tick(self, now):
+        self._unsub_tick = None
+        if self._update_attributes():
+            self.async_schedule_update_ha_state()
+
+    async def async_will_remove_from_hass(self):
+        await super().async_will_remove_from_hass()
+        self._countdown = None
+        self._schedule_tick()
+
+    def _update_attributes(self):
+        changed = super()._update_attributes()
+        self._schedule_tick()
+        if self._status is None:
+            # Unreachable. Dryers and washers disconnect once a cycle is
+            # done, so a running cycle finishes here; the next status is
+            # compared with the last one seen.
+            was_running, self._running = self._running, False
+            if was_running and self.hass is not None:
+                # Name the course that ran, not the unreachable value.
+                self._fire(EVENT_CYCLE_FINISHED,
+                           self._event_data(self._cycle_attributes),
+                           {ATTR_EVENT_PROCESS: self._attributes.get(
+                               self.PROCESS_ATTRIBUTE)})
+            return changed
+
+        previous, self._cycle_attributes = (
+            self._cycle_attributes, self._attributes)
+        was_running, self._running = (
+            self._running, self.is_active(self._status))
+        if previous is None or self.hass is None:
+            return changed
+
+        current = self._attributes
+        data = self._event_data(current)
+        process = current.get(self.PROCESS_ATTRIBUTE)
+        previous_process = previous.get(self.PROCESS_ATTRIBUTE)
+        if self._running and not was_running:
+            self._fire(EVENT_CYCLE_STARTED, data,
+                       {ATTR_EVENT_PROCESS: process})
+        elif self._running and process != previous_process:
+            self._fire(EVENT_PROCESS_CHANGED, data, {
+                ATTR_EVENT_PROCESS: process,
+                ATTR_EVENT_PREVIOUS_PROCESS: previous_process,
+            })
+        elif was_running and not self._running:
+            self._fire(EVENT_CYCLE_FINISHED, data,
+                       {ATTR_EVENT_PROCESS: process})
+
+        error = current.get(self.ERROR_ATTRIBUTE)
+        if (error != previous.get(self.ERROR_ATTRIBUTE) and
+                error not in self.NO_ERRORS):
+            self._fire(EVENT_ERROR, data, {self.ERROR_ATTRIBUTE: error})
+        return changed
+
+    def _event_data(self, attributes):
+        return {
+            ATTR_ENTITY_ID: self.entity_id,
+            ATTR_NAME: self.name,
+            ATTR_EVENT_DEVICE_TYPE: self.DEVICE_TYPE,
+            self.COURSE_ATTRIBUTE: attributes.get(self.COURSE_ATTRIBUTE),
+        }
+
+    def _fire(self, event_type, data, extra):
+        data = dict(data, **extra)
+        LOGGER.debug('%s: %s', event_type, data)
+        self.hass.bus.async_fire(event_type, data)
+
+
+class LGDryerDevice(LGCycleDevice):
+    DEVICE_TYPE = 'dryer'
+    PROCESS_ATTRIBUTE = ATTR_WW_PROCESSSTATE
+
+    def __init__(self, coordinator, device, name):
         """Initialize an LG Dryer Device."""
 
-        super().__init__(client, device)
+        super().__init__(
+            coordinator, device, dryer.DryerDevice, dryer.DryerStatus)
 
         # This constructor is called during platform creation. It must not
         # involve any API calls that actually need the dryer to be
         # connected, otherwise the device construction will fail and the entity
         # will not get created. Specifically, calls that depend on dryer
-        # interaction should only happen in update(...), including the start of
-        # the monitor task.
-        self._dryer = dryer.DryerDevice(client, device)
+        # interaction are left to the coordinator's polling, including the
+        # start of the monitor task.
+        self._dryer = self._polled.device
         self._name = name
-        self._status = None
-        self._failed_request_count = 0
+        self._attribute_table = DRYER_ATTRIBUTES
 
-    @property
-    def state_attributes(self):
-        """Return the optional state attributes for the dryer."""
-        data = {}
-        data[ATTR_WW_REMAINING_TIME] = self.remaining_time
-        data[ATTR_WW_REMAINING_TIME_IN_MINUTES] = self.remaining_time_in_minutes
-        data[ATTR_WW_INITIAL_TIME] = self.initial_time
-        data[ATTR_WW_INITIAL_TIME_IN_MINUTES] = self.initial_time_in_minutes
-        data[ATTR_WW_RESERVE_TIME] = self.reserve_time
-        data[ATTR_WW_RESERVE_TIME_IN_MINUTES] = self.reserve_time_in_minutes
-        data[ATTR_WW_PROCESSSTATE] = self.process_state
-        data[ATTR_WW_COURSE] = self.course
-        data[ATTR_WW_SMARTCOURSE] = self.smart_course
-        data[ATTR_WW_ERROR] = self.error
-        data[ATTR_WW_DRYLEVEL] = self.dry_level
-        data[ATTR_WW_ECOHYBRID] = self.eco_hybrid
-        data[ATTR_WW_ANTICREASE] = self.anti_crease
-        data[ATTR_WW_CHILDLOCK] = self.child_lock
-        data[ATTR_WW_SELFCLEANING] = self.self_cleaning
-        data[ATTR_WW_DAMPDRYBEEP] = self.damp_dry_beep
-        data[ATTR_WW_HANDIRON] = self.hand_iron
-
-        # For convenience, include the state as an attribute.
-        data[ATTR_WW_STATE] = self.state
-        return data
+    @staticmethod
+    def is_active(status):
+        return status.state != KEY_WW_OFF and status.remaining_time > 0
+
+    def is_counting(self, status):
+        return lookup_enum('State', status.data, self._dryer) not in (
+            WW_HOLD_STATES)
 
     @property
     def name(self):
@@ -177,224 +521,39 @@ class LGDryerDevice(LGDevice):
 
     @property
     def state(self):
-        if self._status:
-            return self._status.state
-        return KEY_WW_OFF
-
-    @property
-    def remaining_time(self):
-        minutes = self.remaining_time_in_minutes if self._status else 0
-        return str(datetime.timedelta(minutes=minutes))[:-3]
-
-    @property
-    def remaining_time_in_minutes(self):
-        # The API (indefinitely) returns 1 minute remaining when a cycle is
-        # either in state off or complete, or process night-drying. Return 0
-        # minutes remaining in these instances, which is more reflective of
-        # reality.
-        return self._status.remaining_time if self._status else 0
-
-    @property
-    def initial_time(self):
-        minutes = self.initial_time_in_minutes if self._status else 0
-        return str(datetime.timedelta(minutes=minutes))[:-3]
-
-    @property
-    def initial_time_in_minutes(self):
-        # When in state OFF, the dryer still returns the initial program
-        # length of the previously ran cycle. Instead, return 0 which is more
-        # reflective of the dryer being off.
-        return self._status.initial_time if self._status else 0
-
-    @property
-    def reserve_time(self):
-        minutes = self.reserve_time_in_minutes if self._status else 0
-        return str(datetime.timedelta(minutes=minutes))[:-3]
+        return self._attributes[ATTR_WW_STATE]
 
-    @property
-    def reserve_time_in_minutes(self):
-        return self._status.reserve_time if self._status else 0
-
-    @property
-    def process_state(self):
-        if self._status:
-            return self._status.process_state
-        return KEY_WW_OFF
-
-    @property
-    def course(self):
-        if self._status:
-            return self._status.course
-        return KEY_WW_OFF
-
-    @property
-    def smart_course(self):
-        if self._status:
-            return self._status.smart_course
-        return KEY_WW_OFF
-
-    @property
-    def error(self):
-        if self._status:
-            return self._status.error
-        return KEY_WW_OFF
-
-    def _restart_monitor(self):
-        try:
-            self._dryer.monitor_start()
-        except wideq.NotConnectedError:
-            self._status = None
-        except wideq.NotLoggedInError:
-            LOGGER.info('Session expired. Refreshing.')
-            self._client.refresh()
-
-    @property
-    def dry_level(self):
-        if self._status:
-            if self._status.dry_level != KEY_WW_UNSUPPORT:
-                return self._status.dry_level
-        return KEY_WW_OFF
-
-    @property
-    def eco_hybrid(self):
-        if self._status:
-            if self._status.eco_hybrid != KEY_WW_UNSUPPORT:
-                return self._status.eco_hybrid
-        return KEY_WW_OFF
-
-    @property
-    def anti_crease(self):
-        if self._status:
-            if self._status.anti_crease != KEY_WW_UNSUPPORT:
-                return self._status.anti_crease
-        return KEY_WW_OFF
-
-    @property
-    def child_lock(self):
-        if self._status:
-            if self._status.child_lock != KEY_WW_UNSUPPORT:
-                return self._status.child_lock
-        return KEY_WW_OFF
+class LGWasherDevice(LGCycleDevice):
+    DEVICE_TYPE = 'washer'
+    # Washers report their wash, rinse and spin steps as the state.
+    PROCESS_ATTRIBUTE = ATTR_WW_STATE
 
-    @property
-    def self_cleaning(self):
-        if self._status:
-            if self._status.self_cleaning != KEY_WW_UNSUPPORT:
-                return self._status.self_cleaning
-        return KEY_WW_OFF
-
-    @property
-    def damp_dry_beep(self):
-        if self._status:
-            if self._status.damp_dry_beep != KEY_WW_UNSUPPORT:
-                return self._status.damp_dry_beep
-        return KEY_WW_OFF
-
-    @property
-    def hand_iron(self):
-        if self._status:
-            if self._status.hand_iron != KEY_WW_UNSUPPORT:
-                return self._status.hand_iron
-        return KEY_WW_OFF
-
-    def update(self):
-        """Poll for dryer state updates."""
-
-        # This method is polled, so try to avoid sleeping in here. If an error
-        # occurs, it will naturally be retried on the next poll.
-
-        LOGGER.debug('Updating %s.', self.name)
-
-        # On initial construction, the dryer monitor task
-        # will not have been created. If so, start monitoring here.
-        if getattr(self._dryer, 'mon', None) is None:
-            self._restart_monitor()
-
-        try:
-            status = self._dryer.poll()
-        except wideq.NotConnectedError:
-            self._status = None
-            return
-        except wideq.NotLoggedInError:
-            LOGGER.info('Session expired. Refreshing.')
-            self._client.refresh()
-            self._restart_monitor()
-            return
-
-        if status:
-            LOGGER.debug('Status updated.')
-            self._status = status
-            self._failed_request_count = 0
-            return
-
-        LOGGER.debug('No status available yet.')
-        self._failed_request_count += 1
-
-        if self._failed_request_count >= MAX_RETRIES:
-            # We tried several times but got no result. This might happen
-            # when the monitoring request gets into a bad state, so we
-            # restart the task.
-            self._restart_monitor()
-            self._failed_request_count = 0
-
-
-class LGWasherDevice(LGDevice):
-    def __init__(self, client, device, name):
+    def __init__(self, coordinator, device, name):
         """Initialize an LG Washer Device."""
 
-        super().__init__(client, device)
+        super().__init__(
+            coordinator, device, washer.WasherDevice, washer.WasherStatus)
 
         # This constructor is called during platform creation. It must not
         # involve any API calls that actually need the washer to be
         # connected, otherwise the device construction will fail and the entity
         # will not get created. Specifically, calls that depend on washer
-        # interaction should only happen in update(...), including the start of
-        # the monitor task.
-        self._washer = washer.WasherDevice(client, device)
+        # interaction are left to the coordinator's polling, including the
+        # start of the monitor task.
+        self._washer = self._polled.device
         self._name = name
-        self._status = None
-        self._failed_request_count = 0
+        # Front and top loaders report different options; pick the table
+        # for this model once instead of on every poll.
+        self._attribute_table = WASHER_ATTRIBUTES.get(
+            self._washer.model.model_type, WASHER_OTHER_ATTRIBUTES)
 
-    @property
-    def state_attributes(self):
-        """Return the optional state attributes for the washer."""
-        data = {}
-        data[ATTR_WW_DEVICETYPE] = self.device_type
-        data[ATTR_WW_REMAINING_TIME] = self.remaining_time
-        data[ATTR_WW_REMAINING_TIME_IN_MINUTES] = self.remaining_time_in_minutes
-        data[ATTR_WW_INITIAL_TIME] = self.initial_time
-        data[ATTR_WW_INITIAL_TIME_IN_MINUTES] = self.initial_time_in_minutes
-        data[ATTR_WW_RESERVE_TIME] = self.reserve_time
-        data[ATTR_WW_RESERVE_TIME_IN_MINUTES] = self.reserve_time_in_minutes
-        data[ATTR_WW_PREVIOUSSTATE] = self.previous_state
-        data[ATTR_WW_COURSE] = self.course
-        data[ATTR_WW_SMARTCOURSE] = self.smart_course
-        data[ATTR_WW_ERROR] = self.error
-        data[ATTR_WW_SOILLEVEL] = self.soil_level
-        data[ATTR_WW_WATERTEMP] = self.water_temp
-        data[ATTR_WW_SPINSPEED] = self.spin_speed
-        data[ATTR_WW_RINSECOUNT] = self.rinse_count
-        data[ATTR_WW_CHILDLOCK] = self.child_lock
-        data[ATTR_WW_STEAM] = self.steam
-        data[ATTR_WW_TURBOSHOT] = self.turbo_shot
-
-        if self.device_type == 'FL':
-            data[ATTR_WW_DRYLEVEL] = self.dry_level
-            data[ATTR_WW_FRESHCARE] = self.fresh_care
-            data[ATTR_WW_TUBCLEANCOUNT] = self.tubclean_count
-            data[ATTR_WW_LOADLEVEL] = self.load_level
-        elif self.device_type == 'TL':
-            data[ATTR_WW_WATERLEVEL] = self.water_level
-            data[ATTR_WW_WATERFLOW] = self.water_flow
-            data[ATTR_WW_SOAK] = self.soak
-            data[ATTR_WW_DOORLOCK] = self.door_lock
-            data[ATTR_WW_BUZZER] = self.buzzer
-            data[ATTR_WW_STERILIZE] = self.sterilize
-            data[ATTR_WW_HEATER] = self.heater
-
-        # For convenience, include the state as an attribute.
-        data[ATTR_WW_STATE] = self.state
-        return data
+    @staticmethod
+    def is_active(status):
+        return status.state != KEY_WW_OFF and status.remaining_time > 0
+
+    def is_counting(self, status):
+        return lookup_enum('State', status.data, self._washer) not in (
+            WW_HOLD_STATES)
 
     @property
     def name(self):
@@ -402,283 +561,41 @@ class LGWasherDevice(LGDevice):
 
     @property
     def state(self):
-        if self._status:
-            return self._status.state
-        return KEY_WW_OFF
-
-    @property
-    def device_type(self):
-        if self._status:
-            return self._status.device_type
-        return KEY_WW_OFF
-
-    @property
-    def remaining_time(self):
-        minutes = self.remaining_time_in_minutes if self._status else 0
-        return str(datetime.timedelta(minutes=minutes))[:-3]
-
-    @property
-    def remaining_time_in_minutes(self):
-        # The API (indefinitely) returns 1 minute remaining when a cycle is
-        # either in state off or complete, or process night-drying. Return 0
-        # minutes remaining in these instances, which is more reflective of
-        # reality.
-        return self._status.remaining_time if self._status else 0
-
-    @property
-    def initial_time(self):
-        minutes = self.initial_time_in_minutes if self._status else 0
-        return str(datetime.timedelta(minutes=minutes))[:-3]
-
-    @property
-    def initial_time_in_minutes(self):
-        # When in state OFF, the washer still returns the initial program
-        # length of the previously ran cycle. Instead, return 0 which is more
-        # reflective of the washer being off.
-        return self._status.initial_time if self._status else 0
-
-    @property
-    def reserve_time(self):
-        minutes = self.reserve_time_in_minutes if self._status else 0
-        return str(datetime.timedelta(minutes=minutes))[:-3]
-
-    @property
-    def reserve_time_in_minutes(self):
-        return self._status.reserve_time if self._status else 0
-
-    @property
-    def previous_state(self):
-        if self._status:
-            return self._status.previous_state
-        return KEY_WW_OFF
-
-    @property
-    def course(self):
-        if self._status:
-            return self._status.course
-        return KEY_WW_OFF
-
-    @property
-    def smart_course(self):
-        if self._status:
-            return self._status.smart_course
-        return KEY_WW_OFF
-
-    @property
-    def error(self):
-        if self._status:
-            return self._status.error
-        return KEY_WW_OFF
-
-    @property
-    def soil_level(self):
-        if self._status:
-            if self._status.soil_level != KEY_WW_UNSUPPORT:
-                return self._status.soil_level
-        return KEY_WW_OFF
-
-    @property
-    def water_temp(self):
-        if self._status:
-            if self._status.water_temp != KEY_WW_UNSUPPORT:
-                return self._status.water_temp
-        return KEY_WW_OFF
-
-    @property
-    def spin_speed(self):
-        if self._status:
-            if self._status.spin_speed != KEY_WW_UNSUPPORT:
-                return self._status.spin_speed
-        return KEY_WW_OFF
-
-    @property
-    def rinse_count(self):
-        if self._status:
-            if self._status.rinse_count != KEY_WW_UNSUPPORT:
-                return self._status.rinse_count
-        return KEY_WW_OFF
-
-    @property
-    def dry_level(self):
-        if self._status:
-            if self._status.dry_level != KEY_WW_UNSUPPORT:
-                return self._status.dry_level
-        return KEY_WW_OFF
-
-    @property
-    def water_level(self):
-        if self._status:
-            if self._status.water_level != KEY_WW_UNSUPPORT:
-                return self._status.water_level
-        return KEY_WW_OFF
-
-    @property
-    def water_flow(self):
-        if self._status:
-            if self._status.water_flow != KEY_WW_UNSUPPORT:
-                return self._status.water_flow
-        return KEY_WW_OFF
-
-    @property
-    def soak(self):
-        if self._status:
-            if self._status.soak != KEY_WW_UNSUPPORT:
-                return self._status.soak
-        return KEY_WW_OFF
-
-    @property
-    def fresh_care(self):
-        if self._status:
-            if self._status.fresh_care != KEY_WW_UNSUPPORT:
-                return self._status.fresh_care
-        return KEY_WW_OFF
-
-    @property
-    def child_lock(self):
-        if self._status:
-            if self._status.child_lock != KEY_WW_UNSUPPORT:
-                return self._status.child_lock
-        return KEY_WW_OFF
-
-    @property
-    def door_lock(self):
-        if self._status:
-            if self._status.door_lock != KEY_WW_UNSUPPORT:
-                return self._status.door_lock
-        return KEY_WW_OFF
-
-    @property
-    def steam(self):
-        if self._status:
-            if self._status.steam != KEY_WW_UNSUPPORT:
-                return self._status.steam
-        return KEY_WW_OFF
-
-    @property
-    def turbo_shot(self):
-        if self._status:
-            if self._status.turbo_shot != KEY_WW_UNSUPPORT:
-                return self._status.turbo_shot
-        return KEY_WW_OFF
-
-    @property
-    def buzzer(self):
-        if self._status:
-            if self._status.buzzer != KEY_WW_UNSUPPORT:
-                return self._status.buzzer
-        return KEY_WW_OFF
-
-    @property
-    def sterilize(self):
-        if self._status:
-            if self._status.sterilize != KEY_WW_UNSUPPORT:
-                return self._status.sterilize
-        return KEY_WW_OFF
-
-    @property
-    def heater(self):
-        if self._status:
-            if self._status.heater != KEY_WW_UNSUPPORT:
-                return self._status.heater
-        return KEY_WW_OFF
-
-    @property
-    def tubclean_count(self):
-        if self._status:
-            if self._status.tubclean_count != KEY_WW_UNSUPPORT:
-                return self._status.tubclean_count
-        return KEY_WW_OFF
-
-    @property
-    def load_level(self):
-        if self._status:
-            if self._status.load_level != KEY_WW_UNSUPPORT:
-                return self._status.load_level
-        return KEY_WW_OFF
-
-    def _restart_monitor(self):
-        try:
-            self._washer.monitor_start()
-        except wideq.NotConnectedError:
-            self._status = None
-        except wideq.NotLoggedInError:
-            LOGGER.info('Session expired. Refreshing.')
-            self._client.refresh()
-
-    def update(self):
-        """Poll for washer state updates."""
-
-        # This method is polled, so try to avoid sleeping in here. If an error
-        # occurs, it will naturally be retried on the next poll.
-
-        LOGGER.debug('Updating %s.', self.name)
-
-        # On initial construction, the washer monitor task
-        # will not have been created. If so, start monitoring here.
-        if getattr(self._washer, 'mon', None) is None:
-            self._restart_monitor()
-
-        try:
-            status = self._washer.poll()
-        except wideq.NotConnectedError:
-            self._status = None
-            return
-        except wideq.NotLoggedInError:
-            LOGGER.info('Session expired. Refreshing.')
-            self._client.refresh()
-            self._restart_monitor()
-            return
-
-        if status:
-            LOGGER.debug('Status updated.')
-            self._status = status
-            self._failed_request_count = 0
-            return
-
-        LOGGER.debug('No status available yet.')
-        self._failed_request_count += 1
-
-        if self._failed_request_count >= MAX_RETRIES:
-            # We tried several times but got no result. This might happen
-            # when the monitoring request gets into a bad state, so we
-            # restart the task.
-            self._restart_monitor()
-            self._failed_request_count = 0
-
-
-class LGDishWasherDevice(LGDevice):
-    def __init__(self, client, device, name):
+        return self._attributes[ATTR_WW_STATE]
+
+class LGDishWasherDevice(LGCycleDevice):
+    DEVICE_TYPE = 'dishwasher'
+    # The state shows the process while there is one.
+    PROCESS_ATTRIBUTE = ATTR_DW_STATE
+    COURSE_ATTRIBUTE = ATTR_DW_COURSE
+    ERROR_ATTRIBUTE = ATTR_DW_ERROR
+    NO_ERRORS = ('ERROR_NOERROR', 'No_Error', KEY_DW_DISCONNECTED)
+    REMAINING_ATTRIBUTE = ATTR_DW_REMAINING_TIME
+    REMAINING_MINUTES_ATTRIBUTE = ATTR_DW_REMAINING_TIME_IN_MINUTES
+
+    def __init__(self, coordinator, device, name):
         """Initialize an LG DishWasher Device."""
 
-        super().__init__(client, device)
+        super().__init__(
+            coordinator, device, dishwasher.DishWasherDevice, dishwasher.DishWasherStatus)
 
         # This constructor is called during platform creation. It must not
         # involve any API calls that actually need the dishwasher to be
         # connected, otherwise the device construction will fail and the entity
         # will not get created. Specifically, calls that depend on dishwasher
-        # interaction should only happen in update(...), including the start of
-        # the monitor task.
-        self._dishwasher = dishwasher.DishWasherDevice(client, device)
+        # interaction are left to the coordinator's polling, including the
+        # start of the monitor task.
+        self._dishwasher = self._polled.device
         self._name = name
-        self._status = None
-        self._failed_request_count = 0
+        self._attribute_table = DISHWASHER_ATTRIBUTES
 
-    @property
-    def state_attributes(self):
-        """Return the optional state attributes for the dishwasher."""
-        data = {}
-        data[ATTR_DW_REMAINING_TIME] = self.remaining_time
-        data[ATTR_DW_REMAINING_TIME_IN_MINUTES] = self.remaining_time_in_minutes
-        data[ATTR_DW_INITIAL_TIME] = self.initial_time
-        data[ATTR_DW_INITIAL_TIME_IN_MINUTES] = self.initial_time_in_minutes
-        data[ATTR_DW_RESERVE_TIME] = self.reserve_time
-        data[ATTR_DW_RESERVE_TIME_IN_MINUTES] = self.reserve_time_in_minutes
-        data[ATTR_DW_COURSE] = self.course
-        data[ATTR_DW_ERROR] = self.error
-
-        # For convenience, include the state as an attribute.
-        data[ATTR_DW_STATE] = self.state
-        return data
+    @staticmethod
+    def is_active(status):
+        return status.state not in (dishwasher.DishWasherState.OFF,
+                                    dishwasher.DishWasherState.COMPLETE)
+
+    def is_counting(self, status):
+        return status.state not in DW_HOLD_STATES
 
     @property
     def name(self):
@@ -686,115 +603,71 @@ class LGDishWasherDevice(LGDevice):
 
     @property
     def state(self):
-        if self._status:
-          # Process is a more refined string to use for state, if it's present,
-          # use it instead.
-            return self._status.readable_process or self._status.readable_state
-        return dishwasher.DISHWASHER_STATE_READABLE[
-            dishwasher.DishWasherState.OFF.name]
+        return self._attributes[ATTR_DW_STATE]
 
-    @property
-    def remaining_time(self):
-        minutes = self.remaining_time_in_minutes if self._status else 0
-        return str(datetime.timedelta(minutes=minutes))[:-3]
 
-    @property
-    def remaining_time_in_minutes(self):
-        # The API (indefinitely) returns 1 minute remaining when a cycle is
-        # either in state off or complete, or process night-drying. Return 0
-        # minutes remaining in these instances, which is more reflective of
-        # reality.
-        if (self._status and
-            (self._status.process == dishwasher.DishWasherProcess.NIGHT_DRYING or
-             self._status.state == dishwasher.DishWasherState.OFF or
-             self._status.state == dishwasher.DishWasherState.COMPLETE)):
-            return 0
-        return self._status.remaining_time if self._status else 0
+def _attribute_sensors(parent, icon):
+    """A sensor for each attribute of `parent` except its state."""
+    return [LGAttributeSensor(parent, attribute,
+                              ATTRIBUTE_ICONS.get(attribute, icon),
+                              ATTRIBUTE_UNITS.get(attribute))
+            for attribute in parent._build_attributes(None)
+            if attribute != ATTR_WW_STATE]
+
+
+class LGAttributeSensor(Entity):
+    """One state attribute of an LG appliance as a sensor of its own.
+
+    It reads the value from its parent's attribute snapshot, so it needs no
+    template rendering and writes its state only when that value changed.
+    """
+
+    def __init__(self, parent, attribute, icon, unit=None):
+        self._parent = parent
+        self._attribute = attribute
+        self._icon = icon
+        self._unit = unit
+        self._state = None
+        self._unsub_attributes = None
 
     @property
-    def initial_time(self):
-        minutes = self.initial_time_in_minutes if self._status else 0
-        return str(datetime.timedelta(minutes=minutes))[:-3]
+    def should_poll(self):
+        # The parent pushes every new attribute snapshot.
+        return False
 
     @property
-    def initial_time_in_minutes(self):
-        # When in state OFF, the dishwasher still returns the initial program
-        # length of the previously ran cycle. Instead, return 0 which is more
-        # reflective of the dishwasher being off.
-        if (self._status and
-            self._status.state == dishwasher.DishWasherState.OFF):
-            return 0
-        return self._status.initial_time if self._status else 0
+    def name(self):
+        return '{} {}'.format(self._parent.name, self._attribute)
 
     @property
-    def reserve_time(self):
-        minutes = self.reserve_time_in_minutes if self._status else 0
-        return str(datetime.timedelta(minutes=minutes))[:-3]
+    def state(self):
+        return self._state
 
     @property
-    def reserve_time_in_minutes(self):
-        return self._status.reserve_time if self._status else 0
+    def icon(self):
+        return self._icon
 
     @property
-    def course(self):
-        if self._status:
-            if self._status.smart_course != KEY_DW_OFF:
-                return self._status.smart_course
-            else:
-                return self._status.course
-        return KEY_DW_OFF
+    def unit_of_measurement(self):
+        return self._unit
 
     @property
-    def error(self):
-        if self._status:
-            return self._status.error
-        return KEY_DW_DISCONNECTED
-
-    def _restart_monitor(self):
-        try:
-            self._dishwasher.monitor_start()
-        except wideq.NotConnectedError:
-            self._status = None
-        except wideq.NotLoggedInError:
-            LOGGER.info('Session expired. Refreshing.')
-            self._client.refresh()
-
-    def update(self):
-        """Poll for dishwasher state updates."""
-
-        # This method is polled, so try to avoid sleeping in here. If an error
-        # occurs, it will naturally be retried on the next poll.
-
-        LOGGER.debug('Updating %s.', self.name)
-
-        # On initial construction, the dishwasher monitor task
-        # will not have been created. If so, start monitoring here.
-        if getattr(self._dishwasher, 'mon', None) is None:
-            self._restart_monitor()
-
-        try:
-            status = self._dishwasher.poll()
-        except wideq.NotConnectedError:
-            self._status = None
-            return
-        except wideq.NotLoggedInError:
-            LOGGER.info('Session expired. Refreshing.')
-            self._client.refresh()
-            self._restart_monitor()
-            return
+    def available(self):
+        return self._parent.available
 
-        if status:
-            LOGGER.debug('Status updated.')
-            self._status = status
-            self._failed_request_count = 0
-            return
+    async def async_added_to_hass(self):
+        self._state = self._parent.attributes.get(self._attribute)
+        self._unsub_attributes = self._parent.subscribe_attributes(
+            self._attributes_updated)
 
-        LOGGER.debug('No status available yet.')
-        self._failed_request_count += 1
+    async def async_will_remove_from_hass(self):
+        if self._unsub_attributes:
+            self._unsub_attributes()
+            self._unsub_attributes = None
 
-        if self._failed_request_count >= MAX_RETRIES:
-            # We tried several times but got no result. This might happen
-            # when the monitoring request gets into a bad state, so we
-            # restart the task.
-            self._restart_monitor()
-            self._failed_request_count = 0
+    @callback
+    def _attributes_updated(self, attributes):
+        value = attributes.get(self._attribute)
+        if value != self._state:
+            self._state = value
+            self.async_schedule_update_ha_state()
@@ -0,0 +1,68 @@
+"""
+Throttling of volatile state attributes.
+"""
+import numbers
+import time
+
+CONF_MIN_CHANGE = 'min_change'
+CONF_MIN_INTERVAL = 'min_interval'
+CONF_EXCLUDE = 'exclude'
+
+
+def _small_change(value, published, min_change):
+    return (isinstance(value, numbers.Number) and
+            isinstance(published, numbers.Number) and
+            abs(value - published) < min_change)
+
+
+class AttributeThrottle:
+    """Decides which value of each throttled attribute an entity publishes.
+
+    A new value is held back, and the published one kept, while it differs
+    from that by less than its `min_change`, or while less than its
+    `min_interval` seconds passed since the published value changed. A
+    value held back by the interval is due when the interval ends, which
+    `next_flush` tells. The values an unreachable device shows (no time
+    remaining, off) always go out at once, so a finished cycle is not held
+    back, and so does the first value after them, so the entity does not
+    keep showing them, e.g. after a restart in the middle of a cycle.
+    """
+
+    def __init__(self, options, unreachable):
+        self._options = {
+            attribute: (option.get(CONF_MIN_CHANGE),
+                        option.get(CONF_MIN_INTERVAL))
+            for attribute, option in options.items()
+            if option.get(CONF_MIN_CHANGE) or option.get(CONF_MIN_INTERVAL)}
+        self._unreachable = unreachable
+        self._published = {}
+        self.next_flush = None
+
+    def apply(self, attributes):
+        """Replace the held-back values in `attributes` by the published
+        ones, and return it.
+        """
+        now = time.monotonic()
+        self.next_flush = None
+        for attribute, (min_change, min_interval) in self._options.items():
+            if attribute not in attributes:
+                continue
+            value = attributes[attribute]
+            unreachable = self._unreachable.get(attribute)
+            if attribute in self._published:
+                published, since = self._published[attribute]
+                if value == published:
+                    continue
+                if unreachable not in (value, published):
+                    if min_change and _small_change(
+                            value, published, min_change):
+                        attributes[attribute] = published
+                        continue
+                    if min_interval and now < since + min_interval:
+                        attributes[attribute] = published
+                        self.next_flush = min(
+                            self.next_flush or since + min_interval,
+                            since + min_interval)
+                        continue
+            self._published[attribute] = (value, now)
+        return attributes
@@ -0,0 +1,404 @@
+"""
+Asyncio transport for the LG SmartThinQ API.
+"""
+import base64
+import datetime
+import logging
+import time
+from urllib.parse import urljoin
+
+import async_timeout
+import wideq
+from wideq import core
+from wideq import dehum
+
+from custom_components.smartthinq.decoder import (
+    CompiledLangPackModel, CompiledLangPackProduct, CompiledModelInfo,
+    MonitorDecoder)
+
+# The documents of a wideq device wrapper with compiled lookups: the
+# wrapper's attribute, the compiled class and the DeviceInfo's URL for it.
+COMPILED_DOCUMENTS = (
+    ('model', CompiledModelInfo, 'model_info_url'),
+    ('lang_product', CompiledLangPackProduct, 'lang_pack_product_url'),
+    ('lang_model', CompiledLangPackModel, 'lang_pack_model_url'),
+)
+
+LOGGER = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = 30
+ACCESS_TOKEN_LIFETIME = 3600  # Used when the token response has no expiry.
+ACCESS_TOKEN_MARGIN = 300  # Don't reuse a stored token this close to expiry.
+
+
+class LGTransport:
+    """Awaitable versions of the wideq calls used by the integration.
+
+    Requests go through a pooled aiohttp session instead of `requests`, so
+    polling does not hold an executor thread per device. Results are written
+    back into the wrapped `wideq.Client`, which keeps its model lookups and
+    status decoding working on the same state.
+    """
+
+    def __init__(self, client, websession):
+        self.client = client
+        self.refresh_token = None
+        self.access_token_expiry = None
+        self._websession = websession
+        self._refresh_listeners = []
+        # Monitor decoders by model info URL.
+        self._decoders = {}
+        self._compiled = {}
+        # The last payload, its decoder and its status, by device ID.
+        self._last_polls = {}
+
+    @classmethod
+    def from_state(cls, websession, refresh_token, country=None,
+                   language=None, state=None):
+        """Build a transport for a refresh token without any network access.
+
+        `state` is what `dump_state` returned before a restart. If it was
+        saved for the same refresh token and locale, the last known device
+        list and the gateway are restored right away, and so is the access
+        token while it is unexpired. `async_login` then only has to start a
+        session, or exchange the refresh token if the access token expired.
+        """
+        country = country or wideq.DEFAULT_COUNTRY
+        language = language or wideq.DEFAULT_LANGUAGE
+        transport = cls(wideq.Client(country=country, language=language),
+                        websession)
+        transport.refresh_token = refresh_token
+
+        if state and cls._same_account(state, refresh_token,
+                                       country, language):
+            transport.client._devices = state.get('devices')
+            stored = wideq.Client.load(state)
+            # The gateway does not expire with the access token.
+            transport.client._gateway = stored._gateway
+            if (state['access_token_expiry'] or 0) > (
+                    time.time() + ACCESS_TOKEN_MARGIN):
+                transport.client._auth = stored._auth
+                transport.access_token_expiry = state['access_token_expiry']
+        return transport
+
+    @staticmethod
+    def _same_account(state, refresh_token, country, language):
+        try:
+            return (state['auth']['refresh_token'] == refresh_token and
+                    state['gateway']['country'] == country and
+                    state['gateway']['language'] == language)
+        except (KeyError, TypeError):
+            return False
+
+    @property
+    def known_devices(self):
+        """DeviceInfo objects from the last device list, either restored
+        or returned by the login. Never makes a request.
+        """
+        return [wideq.DeviceInfo(data) for data in self.client._devices or ()]
+
+    async def async_login(self):
+        """Awaitable counterpart of `wideq.Client.from_token`.
+
+        A restored gateway skips the gateway discovery, and a restored
+        access token the token exchange too, so only a session is started.
+        If that token is rejected, this exchanges the refresh token.
+        """
+        client = self.client
+        if client._auth is not None:
+            try:
+                client._session, client._devices = (
+                    await self.async_start_session())
+                LOGGER.debug('Reused the stored LG access token.')
+                return
+            except wideq.APIError:
+                LOGGER.info('The stored LG access token was rejected, '
+                            'logging in again.')
+
+        gateway = client._gateway
+        if gateway is None:
+            gateway = client._gateway = await self.async_gateway()
+        client._auth = core.Auth(gateway, None, self.refresh_token)
+        await self.async_refresh()
+
+    def dump_state(self):
+        """Serialize the gateway, access token and device list for the
+        next start.
+
+        The layout is that of `wideq.Client.dump`, without the model info,
+        plus the access token's expiry time and the raw device list.
+        """
+        gateway = self.client.auth.gateway
+        return {
+            'gateway': {
+                'auth_base': gateway.auth_base,
+                'api_root': gateway.api_root,
+                'oauth_root': gateway.oauth_root,
+                'country': gateway.country,
+                'language': gateway.language,
+            },
+            'auth': {
+                'access_token': self.client.auth.access_token,
+                'refresh_token': self.client.auth.refresh_token,
+            },
+            'country': gateway.country,
+            'language': gateway.language,
+            'access_token_expiry': self.access_token_expiry,
+            'devices': self.client._devices,
+        }
+
+    def add_refresh_listener(self, listener):
+        """Call `listener()` whenever a new access token was obtained."""
+        self._refresh_listeners.append(listener)
+
+    async def async_post(self, url, data=None, access_token=None,
+                         session_id=None):
+        """Make a request in the format used by the API servers.
+
+        This mirrors `wideq.core.lgedm_post`, including the mapping of
+        return codes onto wideq exceptions.
+        """
+        headers = {
+            'x-thinq-application-key': core.APP_KEY,
+            'x-thinq-security-key': core.SECURITY_KEY,
+            'Accept': 'application/json',
+        }
+        if access_token:
+            headers['x-thinq-token'] = access_token
+        if session_id:
+            headers['x-thinq-jsessionId'] = session_id
+
+        async with async_timeout.timeout(REQUEST_TIMEOUT):
+            async with self._websession.post(
+                    url, json={core.DATA_ROOT: data}, headers=headers) as res:
+                out = (await res.json(content_type=None))[core.DATA_ROOT]
+
+        if 'returnCd' in out:
+            code = out['returnCd']
+            if code != '0000':
+                if code == '0102':
+                    raise wideq.NotLoggedInError()
+                elif code == '0106':
+                    raise wideq.NotConnectedError()
+                raise wideq.APIError(code, out['returnMsg'])
+        return out
+
+    async def async_session_post(self, path, data=None):
+        """Make a request authenticated by the client's current session."""
+        session = self.client.session
+        url = urljoin(session.auth.gateway.api_root + '/', path)
+        return await self.async_post(
+            url, data, session.auth.access_token, session.session_id)
+
+    async def async_get_json(self, url):
+        """Download a JSON document such as a model info file."""
+        async with async_timeout.timeout(REQUEST_TIMEOUT):
+            async with self._websession.get(url) as res:
+                res.raise_for_status()
+                return await res.json(content_type=None)
+
+    async def async_gateway(self):
+        """Discover the API hosts for the client's locale."""
+        gw = await self.async_post(core.GATEWAY_URL, {
+            'countryCode': self.client._country,
+            'langCode': self.client._language,
+        })
+        return core.Gateway(gw['empUri'], gw['thinqUri'], gw['oauthUri'],
+                            self.client._country, self.client._language)
+
+    async def async_refresh_auth(self):
+        """Exchange the refresh token for a new access token.
+
+        Returns the token and its lifetime in seconds.
+        """
+        auth = self.client.auth
+        token_url = urljoin(auth.gateway.oauth_root, '/oauth2/token')
+        data = {
+            'grant_type': 'refresh_token',
+            'refresh_token': auth.refresh_token,
+        }
+        timestamp = datetime.datetime.utcnow().strftime(core.DATE_FORMAT)
+        req_url = ('/oauth2/token?grant_type=refresh_token&refresh_token=' +
+                   auth.refresh_token)
+        sig = core.oauth2_signature('{}\n{}'.format(req_url, timestamp),
+                                    core.OAUTH_SECRET_KEY)
+        headers = {
+            'lgemp-x-app-key': core.OAUTH_CLIENT_KEY,
+            'lgemp-x-signature': sig.decode('ascii'),
+            'lgemp-x-date': timestamp,
+            'Accept': 'application/json',
+        }
+
+        async with async_timeout.timeout(REQUEST_TIMEOUT):
+            async with self._websession.post(
+                    token_url, data=data, headers=headers) as res:
+                res_data = await res.json(content_type=None)
+
+        if res_data['status'] != 1:
+            raise wideq.TokenError()
+        return (res_data['access_token'],
+                int(res_data.get('expires_in', ACCESS_TOKEN_LIFETIME)))
+
+    async def async_start_session(self):
+        """Log in with the current access token and start a session."""
+        auth = self.client.auth
+        url = urljoin(auth.gateway.api_root + '/', 'member/login')
+        session_info = await self.async_post(url, {
+            'countryCode': auth.gateway.country,
+            'langCode': auth.gateway.language,
+            'loginType': 'EMP',
+            'token': auth.access_token,
+        })
+        return (core.Session(auth, session_info['jsessionId']),
+                core.get_list(session_info, 'item'))
+
+    async def async_refresh(self):
+        """Awaitable counterpart of `wideq.Client.refresh`."""
+        access_token, lifetime = await self.async_refresh_auth()
+        client = self.client
+        client._auth = core.Auth(
+            client.auth.gateway, access_token, client.auth.refresh_token)
+        self.access_token_expiry = time.time() + lifetime
+        client._session, client._devices = await self.async_start_session()
+        for listener in self._refresh_listeners:
+            listener()
+
+    async def async_get_device(self, device_id):
+        """Look up a DeviceInfo object by device ID."""
+        if not self.client._devices:
+            self.client._devices = core.get_list(
+                await self.async_session_post('device/deviceList'), 'item')
+        return self.client.get_device(device_id)
+
+    async def async_monitor_start(self, device):
+        """Start monitoring a wideq device wrapper."""
+        res = await self.async_session_post('rti/rtiMon', {
+            'cmd': 'Mon',
+            'cmdOpt': 'Start',
+            'deviceId': device.device.id,
+            'workId': core.gen_uuid(),
+        })
+        mon = wideq.Monitor(self.client.session, device.device.id)
+        mon.work_id = res['workId']
+        device.mon = mon
+
+    async def async_monitor_stop(self, mon):
+        """Stop a `wideq.Monitor`."""
+        await self.async_session_post('rti/rtiMon', {
+            'cmd': 'Mon',
+            'cmdOpt': 'Stop',
+            'deviceId': mon.device_id,
+            'workId': mon.work_id,
+        })
+
+    def compile_lookups(self, device):
+        """Give a wideq device wrapper model info and language packs whose
+        lookups are compiled, shared by all devices of the same model.
+
+        Its status labels and control values then resolve through tables
+        built once instead of on every lookup. Makes no requests.
+        """
+        for attr, compiled_type, url_attr in COMPILED_DOCUMENTS:
+            key = (attr, getattr(device.device, url_attr))
+            compiled = self._compiled.get(key)
+            if compiled is None:
+                compiled = self._compiled[key] = compiled_type(
+                    getattr(device, attr).data)
+            setattr(device, attr, compiled)
+        return device
+
+    def invalidate_lookups(self, url):
+        """Forget what was compiled from the document at `url`, after it
+        was updated in place to a new version.
+
+        The compiled lookups are rebuilt on their next use, and so is the
+        monitor decoder of a model info document.
+        """
+        for attr, _, _ in COMPILED_DOCUMENTS:
+            compiled = self._compiled.get((attr, url))
+            if compiled is not None:
+                compiled.invalidate()
+        self._decoders.pop(url, None)
+
+    async def async_poll(self, device, status_type):
+        """Poll a wideq device wrapper for its decoded status.
+
+        `status_type` is the status class the wrapper's own `poll()` builds,
+        e.g. `dryer.DryerStatus`. Returns None while the monitor is warming
+        up or has no data, the same as `poll()`, and raises MonitorError if
+        the monitor went bad.
+
+        A payload identical to the device's previous one returns the same
+        status object without being decoded again.
+        """
+        mon = getattr(device, 'mon', None)
+        if mon is None:
+            return None
+
+        work_list = [{'deviceId': mon.device_id, 'workId': mon.work_id}]
+        res = (await self.async_session_post(
+            'rti/rtiResult', {'workList': work_list}))['workList']
+
+        if 'returnCode' not in res:
+            return None
+        if res.get('returnCode') != '0000':
+            raise wideq.MonitorError(mon.device_id, res.get('returnCode'))
+        if 'returnData' not in res:
+            return None
+
+        payload = res['returnData']
+        url = device.device.model_info_url
+        decoder = self._decoders.get(url)
+        if decoder is None:
+            decoder = self._decoders[url] = MonitorDecoder(device.model)
+        last = self._last_polls.get(mon.device_id)
+        if last is not None and last[0] == payload and last[1] is decoder:
+            return last[2]
+
+        status = status_type(
+            device, decoder.decode(base64.b64decode(payload)))
+        self._last_polls[mon.device_id] = (payload, decoder, status)
+        return status
+
+    async def async_set_control(self, device, key, value):
+        """Set a control of a wideq device wrapper."""
+        await self.async_session_post('rti/rtiControl', {
+            'cmd': 'Control',
+            'cmdOpt': 'Set',
+            'value': {key: value},
+            'deviceId': device.device.id,
+            'workId': core.gen_uuid(),
+            'data': '',
+        })
+
+    async def async_dehum_set_on(self, device, is_on):
+        """Awaitable counterpart of `DehumDevice.set_on`."""
+        key = 'Operation'
+        mode = dehum.DehumOperation.ON if is_on else dehum.DehumOperation.OFF
+        await self.async_set_control(
+            device, key, device.model.enum_value(key, mode.value))
+
+    async def async_dehum_set_mode(self, device, mode):
+        """Awaitable counterpart of `DehumDevice.set_mode`."""
+        key = 'OpMode'
+        value = dehum.DehumOperation[mode].value
+        await self.async_set_control(
+            device, key, device.model.enum_value(key, value))
+
+    async def async_dehum_set_humidity(self, device, hum):
+        """Awaitable counterpart of `DehumDevice.set_humidity`."""
+        await self.async_set_control(device, 'HumidityCfg', hum)
+
+    async def async_dehum_set_windstrength(self, device, mode):
+        """Awaitable counterpart of `DehumDevice.set_windstrength`."""
+        key = 'WindStrength'
+        value = dehum.DehumWindStrength[mode].value
+        await self.async_set_control(
+            device, key, device.model.enum_value(key, value))
+
+    async def async_dehum_set_airremoval(self, device, is_on):
+        """Awaitable counterpart of `DehumDevice.set_airremoval`."""
+        key = 'AirRemoval'
+        mode = dehum.DehumAIRREMOVAL.ON if is_on else dehum.DehumAIRREMOVAL.OFF
+        await self.async_set_control(
+            device, key, device.model.enum_value(key, mode.value))